@@ -0,0 +1,91 @@
+"""
+Build manifest used for incremental rebuilds.
+
+The manifest (web/.build-manifest.json) stores, per build section, the hashes
+of the files the section depends on (e.g. the stylesheet) and a fingerprint of
+every recipe XML that was processed. A recipe is rebuilt only when its content
+hash changes; a change to a dependency invalidates the whole section.
+"""
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_hash(path):
+    """Return the sha256 hex digest of a file, or None if it does not exist"""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    """Return a manifest entry for path.
+
+    The content hash from `previous` is reused when mtime and size are
+    unchanged, so unchanged files cost a stat instead of a full read. A file
+    that was touched but whose content is the same keeps whatever else was
+    recorded in `previous` (e.g. extracted metadata) under its new stamp.
+    """
+    st = os.stat(path)
+    if previous and previous.get('mtime_ns') == st.st_mtime_ns and previous.get('size') == st.st_size:
+        return previous
+    entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': file_hash(path)}
+    if previous and previous.get('sha256') == entry['sha256']:
+        return dict(previous, **entry)
+    return entry
+
+
+def page_stamp(path):
+    """[mtime_ns, size] of a build output, or None if it is missing"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def is_changed(previous, entry):
+    """True if entry's content differs from the previously recorded one"""
+    return previous is None or previous.get('sha256') != entry['sha256']
+
+
+class BuildManifest:
+    """JSON manifest of recipe fingerprints, split into build sections"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {'version': MANIFEST_VERSION}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def section(self, name, deps):
+        """Return the file entries of a section, dropping them if deps changed"""
+        sec = self.data.setdefault(name, {})
+        if sec.get('deps') != deps:
+            sec.clear()
+            sec['deps'] = dict(deps)
+            sec['files'] = {}
+        return sec['files']
+
+    def save(self):
+        """Atomically write the manifest back to disk"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        # compact separators keep json on its C encoder; indent= would not
+        content = json.dumps(self.data, separators=(',', ':'), sort_keys=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
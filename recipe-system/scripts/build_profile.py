@@ -0,0 +1,125 @@
+"""
+Build telemetry shared by the generator scripts.
+
+A BuildProfiler records timed spans per stage (optionally tagged with the
+recipe file they belong to) and named counters. It prints a summary table,
+flags per-file outliers (files taking far longer than the median file), and
+can write a Chrome trace (chrome://tracing, Perfetto) of every span.
+
+Process-pool workers time their work with span() into a plain list and return
+it; the parent merges the list into its profiler. Spans use perf_counter,
+which is a system-wide monotonic clock, so worker spans line up in the trace.
+"""
+import os
+import json
+import time
+import contextlib
+from statistics import median
+
+OUTLIER_FACTOR = 10
+OUTLIER_MIN_SECONDS = 0.001
+OUTLIER_LIMIT = 10
+
+
+@contextlib.contextmanager
+def span(spans, name):
+    """Append (name, start, duration, pid) to spans for the enclosed block"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, start, time.perf_counter() - start, os.getpid()))
+
+
+class BuildProfiler:
+    """Per-stage and per-file timings plus counters for one build run"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = []
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, file=None):
+        """Time the enclosed block as one span of stage `name`"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter() - start, os.getpid(), file))
+
+    def merge(self, spans, file=None):
+        """Add spans recorded with span() (e.g. returned by a worker)"""
+        if self.enabled:
+            self.spans.extend((name, start, duration, pid, file) for name, start, duration, pid in spans)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def outliers(self):
+        """Return ([(file, seconds)], median seconds) for files taking OUTLIER_FACTOR x the median or more.
+
+        With fewer than two files there is no median to compare with: ([], None).
+        """
+        per_file = {}
+        for _, _, duration, _, file in self.spans:
+            if file is not None:
+                per_file[file] = per_file.get(file, 0.0) + duration
+        if len(per_file) < 2:
+            return [], None
+        typical = median(per_file.values())
+        threshold = max(typical * OUTLIER_FACTOR, OUTLIER_MIN_SECONDS)
+        slow = sorted(((d, f) for f, d in per_file.items() if d >= threshold), reverse=True)
+        return [(f, d) for d, f in slow[:OUTLIER_LIMIT]], typical
+
+    def summary(self):
+        """Return the stage table, counters and outliers as text"""
+        stages = {}
+        for name, _, duration, _, _ in self.spans:
+            calls, total, worst = stages.get(name, (0, 0.0, 0.0))
+            stages[name] = (calls + 1, total + duration, max(worst, duration))
+
+        lines = [f'{"stage":<16} {"calls":>8} {"total ms":>10} {"mean ms":>9} {"max ms":>9}']
+        for name, (calls, total, worst) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<16} {calls:>8} {total * 1000:>10.1f} {total / calls * 1000:>9.3f} {worst * 1000:>9.3f}')
+        if self.counters:
+            lines.append('')
+            lines.extend(f'{name:<24} {value:>12}' for name, value in sorted(self.counters.items()))
+        slow, typical = self.outliers()
+        if slow:
+            lines.append('')
+            lines.append(f'Slow files (>= {OUTLIER_FACTOR}x the median of {typical * 1000:.2f} ms):')
+            lines.extend(f'  {file}: {duration * 1000:.1f} ms' for file, duration in slow)
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """Write every span as a Chrome trace event file"""
+        origin = min((start for _, start, _, _, _ in self.spans), default=0.0)
+        events = []
+        for name, start, duration, pid, file in self.spans:
+            event = {'name': name, 'cat': 'build', 'ph': 'X', 'pid': pid, 'tid': pid,
+                     'ts': round((start - origin) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+            if file is not None:
+                event['args'] = {'file': file}
+            events.append(event)
+        if self.counters:
+            events.append({'name': 'counters', 'ph': 'C', 'pid': os.getpid(), 'ts': 0, 'args': self.counters})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def report(self, trace_path=None):
+        """Print the summary and write the trace if requested"""
+        if not self.enabled:
+            return
+        print('\nBuild profile')
+        print(self.summary())
+        if trace_path:
+            self.write_trace(trace_path)
+            print(f'Wrote Chrome trace to {trace_path}')
+
+
+NULL_PROFILER = BuildProfiler(enabled=False)
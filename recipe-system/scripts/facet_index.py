@@ -0,0 +1,95 @@
+"""
+Facet index for the recipe box filters.
+
+Every recipe is filed under one value of each of difficulty, time bucket,
+category and servings, and under each of its tags. At index time every
+facet value gets the increasing list of recipe ids filed under it, written
+to index/facets.js with its count. A list is stored as a bitmap over recipe
+ids (base64 of little-endian bytes, bit i of byte i >> 3 for id i) when that
+is shorter than its delta-encoded form, which it is for values shared by
+more than about one recipe in twenty.
+
+The page turns the lists into bitmaps, ORs the chosen values of a facet and
+ANDs across facets, and counts every value against the other facets'
+selection, so a filter click costs a pass over a few bitmaps rather than
+over the recipes.
+"""
+import base64
+
+from search_index import delta_encode
+
+FACETS_FILE = 'facets.js'
+FACETS = ('difficulty', 'time', 'category', 'tag', 'servings')
+# time bucket: upper bound in minutes (None: no bound), matching the page's chips
+TIME_BUCKETS = (('quick', 30), ('medium', 60), ('long', None))
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+_ORDER = {
+    'difficulty': lambda value: (DIFFICULTIES.index(value) if value in DIFFICULTIES else len(DIFFICULTIES), value),
+    'time': [name for name, _ in TIME_BUCKETS].index,
+    'category': str,
+    'tag': str,
+    'servings': int,
+}
+
+
+def time_bucket(minutes):
+    for name, limit in TIME_BUCKETS:
+        if limit is None or minutes <= limit:
+            return name
+
+
+def recipe_facets(recipe):
+    """The (facet, value) keys a Recipe is filed under"""
+    keys = [('difficulty', recipe.difficulty), ('time', time_bucket(recipe.totalTime)),
+            ('category', recipe.category), ('servings', recipe.servings)]
+    keys.extend(('tag', tag) for tag in dict.fromkeys(recipe.tags))
+    return keys
+
+
+def encode_ids(ids):
+    """Compact JSON form of an increasing id list: a base64 bitmap or the delta-encoded ids"""
+    deltas = delta_encode(ids)
+    size = ids[-1] // 8 + 1 if ids else 0
+    if 4 * ((size + 2) // 3) + 2 < sum(len(str(delta)) + 1 for delta in deltas):
+        bits = bytearray(size)
+        for recipe_id in ids:
+            bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        return base64.b64encode(bits).decode('ascii')
+    return deltas
+
+
+def decode_ids(encoded):
+    """Inverse of encode_ids()"""
+    if isinstance(encoded, str):
+        bits = base64.b64decode(encoded)
+        return [i for i in range(len(bits) * 8) if bits[i >> 3] >> (i & 7) & 1]
+    ids = []
+    recipe_id = 0
+    for delta in encoded:
+        recipe_id += delta
+        ids.append(recipe_id)
+    return ids
+
+
+def facet_payload(postings, count, encode=None):
+    """facets.js payload from {(facet, value): increasing recipe ids} over count recipes.
+
+    encode(keys) returns the 'sets' entry for a facet's keys in order; by
+    default each key's ids go through encode_ids().
+    """
+    if encode is None:
+        def encode(keys):
+            return [encode_ids(postings[key]) for key in keys]
+    values = {facet: [] for facet in FACETS}
+    for facet, value in postings:
+        values[facet].append(value)
+    facets = {}
+    for facet in FACETS:
+        keys = [(facet, value) for value in sorted(values[facet], key=_ORDER[facet])]
+        facets[facet] = {
+            'values': [value for _, value in keys],
+            'counts': [len(postings[key]) for key in keys],
+            'sets': encode(keys),
+        }
+    return {'count': count, 'facets': facets}
@@ -0,0 +1,196 @@
+"""
+Normalized ingredient index and "cook with what I have" queries.
+
+Ingredient text such as "2 cans (15 oz) kidney beans, drained and rinsed" is
+reduced to base names ("kidney bean") at extraction time. At index time every
+name gets the increasing list of recipe ids using it, plus each recipe's
+number of distinct ingredients, written to index/ingredients.js.
+
+PantryIndex turns the posting lists into bitsets over recipe ids (Python
+ints) and ranks recipes for a pantry with bit-sliced counters, so a query
+costs a few dozen big-int operations no matter how many recipes match.
+"""
+import re
+
+from search_index import delta_encode
+
+INGREDIENTS_FILE = 'ingredients.js'
+
+UNIT_WORDS = frozenset('''
+    c cup tbsp tbs tablespoon tsp teaspoon oz ounce lb lbs pound g gram kg kilogram mg ml l
+    liter litre quart pint gallon pinch dash clove can jar package pkg bag box bottle bunch
+    sprig slice stick piece head handful stalk fillet sheet cube drop envelope container
+'''.split())
+DESCRIPTOR_WORDS = frozenset('''
+    fresh freshly large small medium big chopped diced minced sliced grated shredded crushed
+    ground dried finely roughly coarsely thinly thickly cooked uncooked raw peeled boneless
+    skinless whole extra virgin softened melted cold warm room temperature packed drained
+    rinsed beaten halved quartered cubed trimmed divided organic lean fine coarse kosher
+    zested juiced lightly firmly sifted toasted frozen thawed ripe optional about plus
+    additional good quality store bought homemade
+'''.split())
+FILLER_WORDS = frozenset('of to taste for as needed serving garnish a an the into'.split())
+
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_PAREN_RE = re.compile(r'\([^)]*\)')
+_CLAUSE_RE = re.compile(r'[,;:]')
+_CONJUNCTION_RE = re.compile(r'\s(?:and|or|&|plus)\s')
+
+
+def singularize(word):
+    """Cheap English singular form: tomatoes -> tomato, berries -> berry"""
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(text):
+    """Return the base ingredient names in one ingredient line.
+
+    "1 large onion, diced" -> ["onion"]; "Salt and pepper to taste" ->
+    ["salt", "pepper"]; "1 (15 oz) can black beans" -> ["black bean"].
+    Parentheticals are dropped before the line is cut at its first clause.
+    The page ports this function; keep them in sync.
+    """
+    names = []
+    head = _CLAUSE_RE.split(_PAREN_RE.sub(' ', text.lower()), 1)[0]
+    for part in _CONJUNCTION_RE.split(f' {head} '):
+        words = [w for w in _WORD_RE.findall(part)
+                 if singularize(w) not in UNIT_WORDS and w not in DESCRIPTOR_WORDS and w not in FILLER_WORDS]
+        if words:
+            words[-1] = singularize(words[-1])
+            names.append(' '.join(words))
+    return names
+
+
+def recipe_ingredients(texts):
+    """Sorted, de-duplicated base ingredient names for a recipe's ingredient lines"""
+    names = set()
+    for text in texts:
+        names.update(normalize_ingredient(text))
+    return sorted(names)
+
+
+def build_ingredient_index(ingredient_lists):
+    """Return the ingredients.js payload for per-recipe ingredient name lists"""
+    postings = {}
+    totals = []
+    for recipe_id, names in enumerate(ingredient_lists):
+        totals.append(len(names))
+        for name in names:
+            postings.setdefault(name, []).append(recipe_id)
+    return ingredient_payload({name: delta_encode(ids) for name, ids in postings.items()}, totals)
+
+
+def ingredient_payload(encoded_postings, totals):
+    """ingredients.js payload from {name: delta-encoded recipe ids} and per-recipe totals"""
+    names = sorted(encoded_postings)
+    return {
+        'names': names,
+        'postings': [encoded_postings[name] for name in names],
+        'totals': totals,
+        'rules': {
+            'units': sorted(UNIT_WORDS),
+            'descriptors': sorted(DESCRIPTOR_WORDS),
+            'fillers': sorted(FILLER_WORDS),
+        },
+    }
+
+
+class PantryIndex:
+    """Bitset form of the ingredient index for pantry coverage queries"""
+
+    def __init__(self, payload):
+        self.names = payload['names']
+        self.count = len(payload['totals'])
+        self.all = (1 << self.count) - 1
+        self.bitsets = {}
+        for name, deltas in zip(self.names, payload['postings']):
+            bits = bytearray((self.count + 7) // 8)
+            recipe_id = 0
+            for delta in deltas:
+                recipe_id += delta
+                bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+            self.bitsets[name] = int.from_bytes(bits, 'little')
+
+        # per-recipe ingredient totals as bit planes: bit b of totals[i] lives in planes[b]
+        width = max(payload['totals'], default=0).bit_length() or 1
+        self.total_planes = [0] * width
+        for b in range(width):
+            bits = bytearray((self.count + 7) // 8)
+            for recipe_id, total in enumerate(payload['totals']):
+                if total >> b & 1:
+                    bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+            self.total_planes[b] = int.from_bytes(bits, 'little')
+
+    def resolve(self, pantry):
+        """Normalize pantry items and keep the names present in the index"""
+        found = []
+        for item in pantry:
+            for name in normalize_ingredient(item):
+                if name in self.bitsets and name not in found:
+                    found.append(name)
+        return found
+
+    def _equals(self, planes, value):
+        """Bitset of recipes whose bit-sliced counter equals value"""
+        mask = self.all
+        for b, plane in enumerate(planes):
+            mask &= plane if value >> b & 1 else ~plane
+        return mask if value >> len(planes) == 0 else 0
+
+    def rank(self, pantry, limit=20):
+        """Rank recipes by pantry coverage.
+
+        Returns [(recipe_id, have, total)] ordered by fewest missing
+        ingredients, then most pantry ingredients used, then recipe id.
+        """
+        names = self.resolve(pantry)
+        if not names:
+            return []
+
+        # have[i] = number of pantry names recipe i uses, as bit-sliced counters
+        width = len(self.total_planes)
+        have = [0] * width
+        candidates = 0
+        for name in names:
+            carry = self.bitsets[name]
+            candidates |= carry
+            for b in range(width):
+                have[b], carry = have[b] ^ carry, have[b] & carry
+                if not carry:
+                    break
+
+        # missing = total - have, again bit-sliced
+        missing = []
+        borrow = 0
+        for t, h in zip(self.total_planes, have):
+            missing.append(t ^ h ^ borrow)
+            borrow = (~t & (h | borrow)) | (t & h & borrow)
+
+        results = []
+        max_have = min(len(names), (1 << width) - 1)
+        have_masks = [(used, self._equals(have, used)) for used in range(max_have, 0, -1)]
+        for missed in range(1 << width):
+            missed_mask = self._equals(missing, missed) & candidates
+            if not missed_mask:
+                continue
+            for used, have_mask in have_masks:
+                mask = missed_mask & have_mask
+                while mask:
+                    low = mask & -mask
+                    results.append((low.bit_length() - 1, used, used + missed))
+                    if len(results) >= limit:
+                        return results
+                    mask ^= low
+        return results
+
+    def matched(self, recipe_id, names):
+        """The subset of names used by recipe_id"""
+        return [name for name in names if self.bitsets[name] >> recipe_id & 1]
@@ -0,0 +1,121 @@
+"""
+Persistent recipe metadata cache (SQLite, stored next to the web output).
+
+Rows are keyed by recipe path and carry the file's mtime, size and content
+hash together with the extracted metadata (title, tags, category, times,
+validation result). An unchanged file is answered from its stat alone; a file
+whose stat changed but whose content did not is answered after hashing it.
+All rows are dropped when the cache key changes (see metadata_cache_key():
+recipe.xsd hash plus metadata format version), since rows embed validation
+results.
+"""
+import os
+import json
+import sqlite3
+
+from build_manifest import file_hash
+from recipe_model import Recipe
+
+CACHE_NAME = '.metadata-cache.sqlite'
+
+
+class MetadataCache:
+    """SQLite-backed cache of extract_metadata() results"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # callers serialize access; the web server uses it from request threads
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS recipes ('
+                          'path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha256 TEXT, metadata TEXT)')
+        row = self.conn.execute("SELECT value FROM info WHERE key = 'schema'").fetchone()
+        if row is None or row[0] != key:
+            self.conn.execute('DELETE FROM recipes')
+            self.conn.execute("INSERT OR REPLACE INTO info VALUES ('schema', ?)", (key,))
+        # one bulk read of the stamps up front keeps misses to a dict access;
+        # the metadata itself stays on disk until a hit asks for it
+        self._rows = {r[0]: r[1:] for r in self.conn.execute('SELECT path, mtime_ns, size, sha256 FROM recipes')}
+
+    def lookup(self, path, mtime_ns, size, sha256=None):
+        """Return cached metadata for path, or None on a miss (matched as in check())"""
+        if not self.check(path, mtime_ns, size, sha256):
+            return None
+        row = self.conn.execute('SELECT metadata FROM recipes WHERE path = ?', (path,)).fetchone()
+        return Recipe.from_dict(json.loads(row[0]))
+
+    def check(self, path, mtime_ns, size, sha256=None):
+        """True if metadata for path is cached, without reading it.
+
+        Matches on mtime and size, or on sha256 when given (the stored stamp
+        is then refreshed so the next lookup matches on stat alone).
+        """
+        row = self._rows.get(path)
+        if row is not None:
+            if row[0] == mtime_ns and row[1] == size:
+                self.hits += 1
+                return True
+            if sha256 is not None and row[2] == sha256:
+                self.hits += 1
+                self._rows[path] = (mtime_ns, size, sha256)
+                self.conn.execute('UPDATE recipes SET mtime_ns = ?, size = ? WHERE path = ?', (mtime_ns, size, path))
+                return True
+        self.misses += 1
+        return False
+
+    def load(self, paths):
+        """Cached metadata of many paths, read in one query: {path: Recipe}"""
+        wanted = set(paths)
+        return {path: Recipe.from_dict(json.loads(metadata))
+                for path, metadata in self.conn.execute('SELECT path, metadata FROM recipes') if path in wanted}
+
+    def store(self, path, mtime_ns, size, sha256, metadata):
+        """Record the metadata extracted from path"""
+        self._rows[path] = (mtime_ns, size, sha256)
+        self.conn.execute('INSERT OR REPLACE INTO recipes VALUES (?, ?, ?, ?, ?)',
+                          (path, mtime_ns, size, sha256, json.dumps(metadata.as_dict())))
+
+    def get_or_extract(self, path, extract):
+        """Return cached metadata for path, calling extract(path) on a miss"""
+        st = os.stat(path)
+        metadata = self.lookup(path, st.st_mtime_ns, st.st_size)
+        if metadata is not None:
+            return metadata
+        # the stat lookup above already counted this file once
+        self.misses -= 1
+        sha256 = file_hash(path)
+        metadata = self.lookup(path, st.st_mtime_ns, st.st_size, sha256)
+        if metadata is not None:
+            return metadata
+        metadata = extract(path)
+        if metadata is not None:
+            self.store(path, st.st_mtime_ns, st.st_size, sha256, metadata)
+        return metadata
+
+    def prune(self, keep_paths):
+        """Forget every recipe not in keep_paths"""
+        stale = set(self._rows) - set(keep_paths)
+        for path in stale:
+            del self._rows[path]
+        self.conn.executemany('DELETE FROM recipes WHERE path = ?', ((p,) for p in stale))
+
+    def discard(self, path):
+        """Forget one recipe"""
+        if self._rows.pop(path, None) is not None:
+            self.conn.execute('DELETE FROM recipes WHERE path = ?', (path,))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
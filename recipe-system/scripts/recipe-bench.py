@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Build benchmark over synthetic recipe corpora.
+
+Usage:
+  python recipe-bench.py [--sizes 1000 10000 100000] [--output results.json]
+  python recipe-bench.py --compare old.json new.json
+  python recipe-bench.py --sizes 10000 100000 --frame-bench DIR
+
+For every corpus size a schema-valid synthetic corpus is generated (and reused
+on later runs), then a fresh process times each build stage separately:
+parse, validate, extract, parse_time, transform, write, index serialization
+and the recipe box page, followed by a cold and a no-op `build`. Each size
+reports its peak RSS, plus the time and peak RSS of streaming the corpus into
+the index and recipe box in a process of its own (what cookbook-pkg.py does),
+which should stay nearly flat as the corpus grows. Results are written as JSON
+together with the git commit so runs can be compared between commits with
+--compare.
+
+--frame-bench DIR writes a recipe box per corpus size instead, with a driver
+that scrolls, types a query and clicks a filter while recording frame times,
+and DIR/frame-bench.html, which runs each box in turn and tables the results
+in the browser. Boxes of up to FRAME_BENCH_BASELINE_MAX recipes are also
+written rendering every card, as the baseline for the virtualized ones.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+import site_build
+from recipe_box import render_recipe_box
+from recipe_index import INDEX_DIR_NAME, write_index
+from recipe_metadata import extract_metadata, validate_tree
+from recipe_renderer import RecipeRenderer
+from recipe_time import parse_time_to_minutes, parse_times
+from synthetic_corpus import generate_corpus
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'benchmarks'))
+STAGES = ['compile', 'parse', 'validate', 'extract', 'parse_time', 'transform', 'write',
+          'index', 'box', 'build_cold', 'build_noop']
+FRAME_BENCH_BASELINE_MAX = 10000
+
+# Runs in a generated recipe box once every shard is loaded; reports the
+# frame intervals of each phase to frame-bench.html with postMessage
+FRAME_BENCH_DRIVER = """
+(function () {
+    const QUERY = 'chicken curry';
+
+    function summarize(phase, times) {
+        const sorted = times.slice().sort((a, b) => a - b);
+        const pick = q => sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+        return {
+            phase, frames: times.length,
+            mean: times.reduce((a, b) => a + b, 0) / times.length,
+            p50: pick(0.5), p95: pick(0.95), max: sorted[sorted.length - 1],
+            long: times.filter(t => t > 50).length,
+            cards: document.querySelectorAll('.recipe-card:not([hidden])').length,
+        };
+    }
+
+    function measure(phase, steps, act) {
+        // act(step) runs once per frame; the intervals between frames are the result
+        return new Promise(resolve => {
+            const times = [];
+            let last = null, step = 0;
+            requestAnimationFrame(function tick(now) {
+                if (last !== null) times.push(now - last);
+                last = now;
+                if (step === steps) return resolve(summarize(phase, times));
+                act(step++);
+                requestAnimationFrame(tick);
+            });
+        });
+    }
+
+    function type(text) {
+        const input = document.getElementById('searchInput');
+        input.value = text;
+        input.dispatchEvent(new Event('input'));
+    }
+
+    function ready() {
+        return recipes.length === INDEX.count && facets !== null
+            ? Promise.resolve()
+            : new Promise(resolve => setTimeout(resolve, 100)).then(ready);
+    }
+
+    ready().then(async () => {
+        const bottom = () => document.documentElement.scrollHeight - window.innerHeight;
+        const phases = [];
+        phases.push(await measure('scroll', 300, () => window.scrollBy(0, 150)));
+        phases.push(await measure('jump', 60, step => window.scrollTo(0, bottom() * ((step * 7919) % 60) / 60)));
+        window.scrollTo(0, 0);
+        phases.push(await measure('type', QUERY.length + 30, step => step < QUERY.length && type(QUERY.slice(0, step + 1))));
+        phases.push(await measure('clear', 30, step => step === 0 && type('')));
+        phases.push(await measure('filter', 30, step => step === 0 && document.querySelector('#facet-difficulty .tag').click()));
+        const result = {count: INDEX.count, virtual: RENDER.virtual, phases};
+        console.log(JSON.stringify(result));
+        window.parent.postMessage({frameBench: result}, '*');
+    });
+})();
+"""
+
+FRAME_BENCH_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Recipe box frame times</title>
+    <style>
+        body { font-family: sans-serif; margin: 20px; }
+        table { border-collapse: collapse; margin: 15px 0; }
+        th, td { border: 1px solid #ccc; padding: 4px 10px; text-align: right; }
+        iframe { width: 1200px; height: 800px; border: 1px solid #ccc; }
+    </style>
+</head>
+<body>
+    <h1>Recipe box frame times</h1>
+    <p>Each box scrolls, jumps, types a query, clears it and clicks a filter; times are ms between frames.</p>
+    <table>
+        <thead><tr><th>recipes</th><th>rendering</th><th>phase</th><th>frames</th><th>mean</th><th>p50</th>
+            <th>p95</th><th>max</th><th>&gt; 50 ms</th><th>cards in DOM</th></tr></thead>
+        <tbody id="rows"></tbody>
+    </table>
+    <pre id="json"></pre>
+    <iframe id="box"></iframe>
+    <script>
+        const RUNS = %s;
+        const results = [];
+        const rows = document.getElementById('rows');
+
+        function run(i) {
+            if (i === RUNS.length) {
+                document.getElementById('box').remove();
+                document.getElementById('json').textContent = JSON.stringify(results, null, 1);
+                return;
+            }
+            window.onmessage = event => {
+                if (!event.data.frameBench) return;
+                const result = event.data.frameBench;
+                results.push(result);
+                result.phases.forEach(p => rows.insertAdjacentHTML('beforeend', `<tr><td>${result.count}</td>
+                    <td>${result.virtual ? 'virtual' : 'all cards'}</td><td>${p.phase}</td><td>${p.frames}</td>
+                    ${[p.mean, p.p50, p.p95, p.max].map(t => `<td>${t.toFixed(1)}</td>`).join('')}
+                    <td>${p.long}</td><td>${p.cards}</td></tr>`));
+                run(i + 1);
+            };
+            document.getElementById('box').src = RUNS[i];
+        }
+        run(0);
+    </script>
+</body>
+</html>
+"""
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def bench_corpus(corpus_dir, work_dir, jobs=1):
+    """Time every build stage over one corpus; runs in a fresh process"""
+    timings = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    pages_dir = os.path.join(work_dir, 'stages', 'recipes')
+    os.makedirs(pages_dir, exist_ok=True)
+
+    start = clock()
+    renderer = RecipeRenderer()
+    renderer.compile()
+    timings['compile'] = clock() - start
+
+    recipes = []
+    total_times = []
+    names = sorted(name for name in os.listdir(corpus_dir) if name.endswith('.xml'))
+    for name in names:
+        t0 = clock()
+        tree = etree.parse(os.path.join(corpus_dir, name))
+        t1 = clock()
+        valid, errors = validate_tree(tree)
+        t2 = clock()
+        metadata = extract_metadata(tree, validate=False)
+        t3 = clock()
+        html_content = renderer.render_tree(tree)
+        t4 = clock()
+        with open(os.path.join(pages_dir, name[:-4] + '.html'), 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        t5 = clock()
+        timings['parse'] += t1 - t0
+        timings['validate'] += t2 - t1
+        timings['extract'] += t3 - t2
+        timings['transform'] += t4 - t3
+        timings['write'] += t5 - t4
+
+        metadata.id = name[:-4]
+        metadata.set_validation(valid, errors)
+        recipes.append(metadata)
+        total_times.append(metadata.totalTimeDisplay)
+
+    # cold: extraction above has already filled the parser's cache
+    parse_time_to_minutes.cache_clear()
+    start = clock()
+    parse_times(total_times)
+    timings['parse_time'] = clock() - start
+
+    start = clock()
+    index_manifest = write_index(recipes, os.path.join(work_dir, 'stages', 'index'))
+    timings['index'] = clock() - start
+
+    start = clock()
+    render_recipe_box(index_manifest)
+    timings['box'] = clock() - start
+    del recipes, total_times
+
+    # end to end: the real single-pass build, cold and then with nothing changed
+    web_dir = os.path.join(work_dir, 'site')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for stage in ('build_cold', 'build_noop'):
+            start = clock()
+            site_build.build_site(recipes_dir=corpus_dir, web_dir=web_dir, jobs=jobs)
+            timings[stage] = clock() - start
+
+    return {
+        'size': len(names),
+        'stages': {stage: {'seconds': round(seconds, 6),
+                           'per_recipe_us': round(seconds / len(names) * 1e6, 3) if names else 0.0}
+                   for stage, seconds in timings.items()},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def iter_metadata(corpus_dir, names):
+    for name in names:
+        tree = etree.parse(os.path.join(corpus_dir, name))
+        valid, errors = validate_tree(tree)
+        metadata = extract_metadata(tree, validate=False)
+        metadata.id = name[:-4]
+        metadata.set_validation(valid, errors)
+        yield metadata
+
+
+def bench_stream(corpus_dir, work_dir):
+    """Stream the corpus into the index and recipe box; runs in a fresh process"""
+    start = time.perf_counter()
+    with os.scandir(corpus_dir) as it:
+        names = sorted(entry.name for entry in it if entry.name.endswith('.xml'))
+    index_manifest = write_index(iter_metadata(corpus_dir, names), os.path.join(work_dir, 'stream', 'index'))
+    render_recipe_box(index_manifest)
+    return {'seconds': round(time.perf_counter() - start, 6), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def in_fresh_process(fn, *args):
+    """Run fn in a new interpreter so its peak RSS is its own"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def write_frame_bench(corpus_dir, bench_dir, size):
+    """Write the frame-time boxes for one corpus; returns their paths relative to bench_dir"""
+    out_dir = os.path.join(bench_dir, str(size))
+    with os.scandir(corpus_dir) as it:
+        names = sorted(entry.name for entry in it if entry.name.endswith('.xml'))
+    index_manifest = write_index(iter_metadata(corpus_dir, names), os.path.join(out_dir, INDEX_DIR_NAME))
+    modes = [('recipe-box.html', True)]
+    if size <= FRAME_BENCH_BASELINE_MAX:
+        modes.append(('recipe-box-all.html', False))
+    pages = []
+    for name, virtual in modes:
+        with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+            f.write(render_recipe_box(index_manifest, render_config={'virtual': virtual},
+                                      extra_script=FRAME_BENCH_DRIVER))
+        pages.append(f'{size}/{name}')
+    return pages
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(result):
+    print(f'\n{result["size"]} recipes — peak RSS {result["peak_rss_mb"]} MB')
+    if 'stream' in result:
+        print(f'  streaming index + box: {result["stream"]["seconds"]:.3f} s, '
+              f'peak RSS {result["stream"]["peak_rss_mb"]} MB')
+    print(f'  {"stage":<12} {"seconds":>10} {"µs/recipe":>12}')
+    for stage, timing in result['stages'].items():
+        print(f'  {stage:<12} {timing["seconds"]:>10.3f} {timing["per_recipe_us"]:>12.1f}')
+
+
+def compare(old_path, new_path):
+    """Print per-stage time ratios (new / old) for sizes present in both runs"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {r['size']: r for r in json.load(f)['results']}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new_run = json.load(f)
+    for result in new_run['results']:
+        base = old.get(result['size'])
+        if base is None:
+            continue
+        print(f'\n{result["size"]} recipes (peak RSS {base["peak_rss_mb"]} -> {result["peak_rss_mb"]} MB)')
+        if 'stream' in base and 'stream' in result:
+            print(f'  streaming peak RSS {base["stream"]["peak_rss_mb"]} -> {result["stream"]["peak_rss_mb"]} MB')
+        for stage, timing in result['stages'].items():
+            before = base['stages'].get(stage, {}).get('seconds')
+            if before:
+                ratio = timing['seconds'] / before
+                flag = '  <-- slower' if ratio > 1.10 else ''
+                print(f'  {stage:<12} {before:>9.3f}s -> {timing["seconds"]:>9.3f}s  x{ratio:.2f}{flag}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the recipe build on synthetic corpora')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-root', default=os.path.join(tempfile.gettempdir(), 'recipe-bench'),
+                        help='Where synthetic corpora are generated and cached')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Worker processes for the end-to-end build')
+    parser.add_argument('--output', help='Results JSON path (default: benchmarks/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files and exit')
+    parser.add_argument('--frame-bench', metavar='DIR',
+                        help='Write recipe boxes and DIR/frame-bench.html to measure browser frame times, and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    if args.frame_bench:
+        pages = []
+        for size in args.sizes:
+            corpus_dir = os.path.join(args.corpus_root, f'corpus-{size}-{args.seed}')
+            generate_corpus(corpus_dir, size, seed=args.seed)
+            pages.extend(write_frame_bench(corpus_dir, args.frame_bench, size))
+        output = os.path.join(args.frame_bench, 'frame-bench.html')
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(FRAME_BENCH_PAGE % json.dumps(pages))
+        print(f'Wrote {output}; open it in a browser')
+        return 0
+
+    commit = git_commit()
+    run = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'lxml': '.'.join(map(str, etree.LXML_VERSION)),
+        'platform': platform.platform(),
+        'results': [],
+    }
+    for size in args.sizes:
+        corpus_dir = os.path.join(args.corpus_root, f'corpus-{size}-{args.seed}')
+        start = time.perf_counter()
+        generate_corpus(corpus_dir, size, seed=args.seed)
+        print(f'Corpus of {size} recipes ready in {time.perf_counter() - start:.1f} s: {corpus_dir}')
+
+        # a fresh process per size so peak RSS belongs to that size alone
+        with tempfile.TemporaryDirectory(prefix='recipe-bench-') as work_dir:
+            result = in_fresh_process(bench_corpus, corpus_dir, work_dir, args.jobs)
+            result['stream'] = in_fresh_process(bench_stream, corpus_dir, work_dir)
+        print_results(result)
+        run['results'].append(result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit or "local"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=1)
+    print(f'\nWrote {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
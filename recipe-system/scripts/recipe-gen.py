@@ -1,43 +1,150 @@
 import os
-from lxml import etree
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-import xml.etree.ElementTree as ET
+from recipe_renderer import RecipeRenderer, init_worker, render_job, render_to_file
+from build_profile import NULL_PROFILER, BuildProfiler
+from build_manifest import MANIFEST_NAME, BuildManifest, file_hash, fingerprint, is_changed, page_stamp
+from static_assets import AssetWriter
 
 # Define paths
 xml_directory = '/home/tprettol/repo/fluffy-spoon/recipe-system/recipes'  # Update with the actual path to your XML files
 xsl_file = '/home/tprettol/repo/fluffy-spoon/recipe-system/stylesheets/recipe-style.xsl'
 output_directory = '/home/tprettol/repo/fluffy-spoon/recipe-system/web/recipes'
 
+# Pages here inline the stylesheet's CSS, unlike recipe-site.py's, so their
+# fingerprints live apart from its 'pages' section in the shared manifest
+MANIFEST_SECTION = 'recipe-gen-pages'
+
 # Ensure output directory exists
 os.makedirs(output_directory, exist_ok=True)
 
+# Stylesheet is compiled once and reused for every recipe
+renderer = RecipeRenderer(xsl_file)
+
 # Function to transform XML to HTML using XSLT
 def transform_xml_to_html(xml_file):
-    # Parse the XML and XSL files
-    xml_tree = etree.parse(xml_file)
-    xslt_tree = etree.parse(xsl_file)
-    transform = etree.XSLT(xslt_tree)
+    return renderer.render_file(xml_file)
+
+def _render_serial(jobs):
+    """Render (xml_path, output_file) jobs in-process, collecting errors"""
+    for xml_path, output_file in jobs:
+        yield render_to_file(renderer, xml_path, output_file)
+
+
+def _render_parallel(jobs, workers):
+    """Render jobs across a process pool; results come back in job order.
+
+    The workers' compile and transform timings are added to `renderer`'s.
+    """
+    xml_paths = [xml_path for xml_path, _ in jobs]
+    output_files = [output_file for _, output_file in jobs]
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(xsl_file,)) as pool:
+        for error, spans, written, timings in pool.map(render_job, xml_paths, output_files, chunksize=chunksize):
+            renderer.add_timings(timings)
+            yield error, spans, written
 
-    # Transform XML to HTML
-    html_tree = transform(xml_tree)
-    return str(html_tree)
 
 # Function to generate recipe pages
-def generate_recipe_pages():
-    for xml_file in os.listdir(xml_directory):
+def generate_recipe_pages(jobs=None, profiler=NULL_PROFILER):
+    """Render changed recipes, using up to `jobs` worker processes (default: all CPUs).
+
+    Returns a list of (xml_file, error) for recipes that failed to render.
+    """
+    jobs = jobs or os.cpu_count() or 1
+
+    # Only recipes whose content changed since the last run are re-rendered;
+    # a stylesheet change invalidates every page
+    with profiler.stage('manifest_load'):
+        manifest = BuildManifest(os.path.join(os.path.dirname(output_directory), MANIFEST_NAME))
+        built = manifest.section(MANIFEST_SECTION, {'xsl': file_hash(xsl_file)})
+    # keeps the .gz/.br copies the site build serves in step with the pages written here
+    assets = AssetWriter(os.path.dirname(output_directory), manifest)
+    seen = set()
+    pending = []
+    skipped = 0
+
+    for xml_file in sorted(os.listdir(xml_directory)):
         if xml_file.endswith('.xml'):
+            seen.add(xml_file)
             xml_path = os.path.join(xml_directory, xml_file)
-            html_content = transform_xml_to_html(xml_path)
-
-            # Create HTML file for each recipe
             recipe_name = os.path.splitext(xml_file)[0]
             output_file = os.path.join(output_directory, f'{recipe_name}.html')
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            previous = built.get(xml_file)
+            with profiler.stage('fingerprint', xml_file):
+                entry = fingerprint(xml_path, previous)
+            if not is_changed(previous, entry) and entry.get('page') == page_stamp(output_file):
+                built[xml_file] = entry
+                skipped += 1
+                continue
+            pending.append((xml_file, xml_path, output_file, entry))
 
+    # Transform and write; a pool is only worth starting for more than one page
+    start = time.perf_counter()
+    render_jobs = [(xml_path, output_file) for _, xml_path, output_file, _ in pending]
+    if jobs > 1 and len(render_jobs) > 1:
+        results = _render_parallel(render_jobs, min(jobs, len(render_jobs)))
+    else:
+        # compile up front so the first recipe's timing doesn't include it
+        if render_jobs:
+            with profiler.stage('compile'):
+                renderer.refresh()
+        results = _render_serial(render_jobs)
+
+    errors = []
+    for (xml_file, _, output_file, entry), (error, spans, written) in zip(pending, results):
+        profiler.merge(spans, xml_file)
+        profiler.count('files_parsed')
+        profiler.count('bytes_written', written)
+        if error:
+            errors.append((xml_file, error))
+            built.pop(xml_file, None)
+        else:
+            with profiler.stage('compress', xml_file):
+                assets.compress([output_file])
+            built[xml_file] = dict(entry, page=page_stamp(output_file))
             print(f'Generated: {output_file}')
+    elapsed = time.perf_counter() - start
+
+    # Prune pages whose recipe XML was deleted
+    for xml_file in sorted(set(built) - seen):
+        recipe_name = os.path.splitext(xml_file)[0]
+        output_file = os.path.join(output_directory, f'{recipe_name}.html')
+        if os.path.exists(output_file):
+            os.remove(output_file)
+            print(f'Removed: {output_file}')
+        assets.forget(output_file)
+        del built[xml_file]
+
+    with profiler.stage('manifest_save'):
+        manifest.save()
+    profiler.count('files_scanned', len(seen))
+    profiler.count('cache_hits', skipped)
+    profiler.count('render_errors', len(errors))
+    print(f'Up to date: {skipped} recipe(s) unchanged')
+    print(f'Rendered {len(pending) - len(errors)} page(s) in {elapsed:.2f} s using {jobs} job(s)')
+    print(renderer.timing_report())
+
+    if errors:
+        print(f'{len(errors)} recipe(s) failed to render:')
+        for xml_file, error in errors:
+            print(f'  {xml_file}: {error}')
+    return errors
 
 # Main execution
 if __name__ == '__main__':
-    generate_recipe_pages()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate an HTML page for every recipe XML')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count(), help='Worker processes for XSLT rendering (default: number of CPUs)')
+    parser.add_argument('--profile', action='store_true', help='Print per-stage timings, counters and slow files')
+    parser.add_argument('--trace', metavar='FILE', help='With --profile, also write a Chrome trace JSON to FILE')
+    args = parser.parse_args()
+
+    profiler = BuildProfiler(enabled=args.profile or bool(args.trace))
+    with profiler.stage('total'):
+        errors = generate_recipe_pages(jobs=args.jobs, profiler=profiler)
+    profiler.report(args.trace)
+    sys.exit(1 if errors else 0)
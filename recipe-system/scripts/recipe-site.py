@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Recipe site command line.
+
+Usage:
+  python recipe-site.py build [--jobs N] [--fail-fast] [--no-assets] [--profile] [--trace trace.json]
+  python recipe-site.py build --watch [--poll]
+  python recipe-site.py validate [FILE.xml ...] [--jobs N] [--fail-fast] [--report report.json|-]
+  python recipe-site.py pantry "onion, garlic, rice" [--limit N]
+  python recipe-site.py import recipes.jsonl|recipes.csv|- [--format csv] [--replace]
+
+`build` parses each recipe once, validates it, extracts its recipe box
+metadata and renders its page from the same tree, then writes recipe-box.html.
+Only recipes changed since the last build are reprocessed. With --watch it
+keeps running and rebuilds the affected pages and index files on every save.
+With --fail-fast every recipe is validated first and nothing is built if one
+is invalid. Shared CSS and JS are written once as content-hashed files under
+web/assets/, and every page, asset and index file gets precompressed .gz
+(and, with the brotli module, .br) copies; --no-assets inlines them instead.
+
+`validate` checks recipes against recipe.xsd across worker processes, caching
+results per content hash in the web directory (where `build` reuses them), and
+optionally writes a JSON report. It exits 1 if any recipe is invalid; with
+--fail-fast it stops at the first one.
+
+`pantry` ranks recipes by how much of each one a list of ingredients on hand
+covers, using the ingredient index written by the build.
+
+`import` streams recipes from a JSON Lines or CSV export, validates each one,
+writes the valid ones to the recipes folder in batches and then updates the
+site once for all of them. Rejected records are listed with their line.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+import site_build
+import site_watch
+from build_profile import BuildProfiler
+from ingredient_index import PantryIndex
+from recipe_box import CREATE_LINK_MODES
+from recipe_import import BATCH_SIZE, FORMATS, detect_format, import_recipes, iter_records
+from recipe_index import INDEX_DIR_NAME, read_ingredients, read_records
+
+
+def cmd_build(args):
+    profiler = BuildProfiler(enabled=args.profile or bool(args.trace))
+    if args.watch:
+        site_watch.watch(recipes_dir=args.recipes_dir, web_dir=args.web_dir, xsl_path=args.xsl,
+                         poll=args.poll, profiler=profiler, create_link=args.create_link, assets=not args.no_assets)
+        profiler.report(args.trace)
+        return 0
+    with profiler.stage('total'):
+        errors = site_build.build_site(recipes_dir=args.recipes_dir, web_dir=args.web_dir, xsl_path=args.xsl,
+                                       jobs=args.jobs, profiler=profiler, create_link=args.create_link,
+                                       fail_fast=args.fail_fast, assets=not args.no_assets)
+    profiler.report(args.trace)
+    return 1 if errors else 0
+
+
+def recipe_path(arg, recipes_dir):
+    """A bare file name is looked up in the recipes folder; any other path is used as given"""
+    if os.path.dirname(arg):
+        return os.path.abspath(arg)
+    return os.path.join(os.path.abspath(recipes_dir), arg)
+
+
+def cmd_validate(args):
+    paths = [recipe_path(arg, args.recipes_dir) for arg in args.files] or None
+    report = site_build.validate_site(recipes_dir=args.recipes_dir, web_dir=args.web_dir, jobs=args.jobs,
+                                      fail_fast=args.fail_fast, paths=paths)
+    # with the report on stdout, the human-readable lines go to stderr
+    out = sys.stderr if args.report == '-' else sys.stdout
+    recipes_dir = os.path.abspath(args.recipes_dir)
+    for path, errors in sorted(report.failures):
+        name = os.path.basename(path) if os.path.dirname(path) == recipes_dir else os.path.relpath(path)
+        print(f'  {name}:', file=out)
+        for error in errors:
+            print(f'    {error}', file=out)
+    print(report.summary(), file=out)
+    if args.report:
+        content = json.dumps(report.as_dict(), indent=1)
+        if args.report == '-':
+            print(content)
+        else:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                f.write(content + '\n')
+    return 0 if report.ok else 1
+
+
+def cmd_pantry(args):
+    index_dir = os.path.join(args.web_dir, INDEX_DIR_NAME)
+    try:
+        payload = read_ingredients(index_dir)
+    except FileNotFoundError:
+        print(f'No ingredient index in {index_dir}; run "recipe-site.py build" first')
+        return 1
+    pantry = [item.strip() for arg in args.items for item in arg.split(',') if item.strip()]
+
+    index = PantryIndex(payload)
+    start = time.perf_counter()
+    ranked = index.rank(pantry, limit=args.limit)
+    elapsed = time.perf_counter() - start
+
+    names = index.resolve(pantry)
+    print(f'Pantry: {", ".join(names) or "(no known ingredients)"}')
+    records = read_records(index_dir, [recipe_id for recipe_id, _, _ in ranked])
+    for recipe_id, have, total in ranked:
+        print(f'  {have}/{total}  {records[recipe_id]["title"]}  [{", ".join(index.matched(recipe_id, names))}]')
+    print(f'{len(ranked)} recipe(s) ranked in {elapsed * 1000:.2f} ms')
+    return 0
+
+
+def cmd_import(args):
+    fmt = args.format or detect_format(args.input)
+    if args.input == '-':
+        source = contextlib.nullcontext(sys.stdin)
+    else:
+        source = open(args.input, 'r', encoding='utf-8', newline='')
+    with source as stream:
+        report = import_recipes(iter_records(stream, fmt), args.recipes_dir,
+                                batch_size=args.batch_size, replace=args.replace)
+    for line_number, title, reason in report.rejects:
+        print(f'  line {line_number}: {title or "(untitled)"}: {reason}')
+    print(report.summary())
+    if report.imported and not args.no_build:
+        # one build picks up every imported recipe; the others come from the cache
+        errors = site_build.build_site(recipes_dir=args.recipes_dir, web_dir=args.web_dir)
+        if errors:
+            return 1
+    return 1 if report.rejects else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recipe site build tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Validate, index and render all recipes in one pass')
+    build.add_argument('--recipes-dir', default=site_build.RECIPES_DIR)
+    build.add_argument('--web-dir', default=site_build.WEB_DIR)
+    build.add_argument('--xsl', default=site_build.DEFAULT_XSL)
+    build.add_argument('--jobs', '-j', type=int, default=1, help='Worker processes (default: 1, streaming in-process)')
+    build.add_argument('--watch', action='store_true',
+                       help='Keep running and rebuild affected pages whenever recipes, the stylesheet or the schema change')
+    build.add_argument('--poll', action='store_true', help='With --watch, poll for changes instead of using inotify')
+    build.add_argument('--create-link', choices=CREATE_LINK_MODES, default='client',
+                       help='"Create Recipe" link: checked by the browser (client, default), by the build (probe), '
+                            'always shown (force) or left out (none)')
+    build.add_argument('--fail-fast', action='store_true',
+                       help='Validate every recipe first and build nothing if one is invalid')
+    build.add_argument('--no-assets', action='store_true',
+                       help='Inline CSS and JS into every page and write no precompressed copies')
+    build.add_argument('--profile', action='store_true', help='Print per-stage timings, counters and slow files')
+    build.add_argument('--trace', metavar='FILE', help='With --profile, also write a Chrome trace JSON to FILE')
+    build.set_defaults(func=cmd_build)
+
+    validate = sub.add_parser('validate', help='Check recipes against the schema, in parallel and cached')
+    validate.add_argument('files', nargs='*',
+                          help='Recipe files; bare names are looked up in the recipes folder (default: all recipes)')
+    validate.add_argument('--recipes-dir', default=site_build.RECIPES_DIR)
+    validate.add_argument('--web-dir', default=site_build.WEB_DIR, help='Where the validation cache is kept')
+    validate.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                          help='Worker processes (default: one per CPU)')
+    validate.add_argument('--fail-fast', action='store_true', help='Stop at the first invalid recipe')
+    validate.add_argument('--report', metavar='FILE', help='Write a JSON report to FILE (- for standard output)')
+    validate.set_defaults(func=cmd_validate)
+
+    pantry = sub.add_parser('pantry', help='Rank recipes by how well your pantry covers their ingredients')
+    pantry.add_argument('items', nargs='+', help='Ingredients on hand (separate arguments or comma-separated)')
+    pantry.add_argument('--web-dir', default=site_build.WEB_DIR)
+    pantry.add_argument('--limit', type=int, default=20)
+    pantry.set_defaults(func=cmd_pantry)
+
+    imp = sub.add_parser('import', help='Import recipes from a JSON Lines or CSV export')
+    imp.add_argument('input', help='.jsonl or .csv file, or - for standard input')
+    imp.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension, else jsonl)')
+    imp.add_argument('--replace', action='store_true', help='Overwrite recipes whose file name already exists')
+    imp.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Recipes written per batch of renames')
+    imp.add_argument('--no-build', action='store_true', help='Only write the recipe XML; skip updating the site')
+    imp.add_argument('--recipes-dir', default=site_build.RECIPES_DIR)
+    imp.add_argument('--web-dir', default=site_build.WEB_DIR)
+    imp.set_defaults(func=cmd_import)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
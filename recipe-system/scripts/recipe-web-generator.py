@@ -11,90 +11,42 @@ Usage:
       python recipe-web-generator.py --serve
 
 The web UI provides a form to create a recipe XML file placed in the recipes folder.
+The server also renders the site straight from the XML: /recipe-box.html and
+/recipes/<slug>, from an in-memory cache (--prewarm fills it at startup).
+Recipes created through the form are also written through to the static
+site in web/: their page is rendered and validated and the recipe box index
+is updated incrementally. Recipe files added, edited or deleted by other
+means are picked up the same way by a watcher on the recipes folder.
 """
 import os
 import argparse
 import datetime
-import re
+import io
 import sys
-from xml.etree import ElementTree as ET
-from xml.dom import minidom
+import threading
+
+from recipe_import import build_recipe_tree, prettify_xml, recipe_data, slugify, write_batch, write_new_recipe
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 RECIPES_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'recipes'))
-NS = 'http://www.example.com/recipe'
 
 os.makedirs(RECIPES_DIR, exist_ok=True)
 
 
-def slugify(text):
-    text = text.lower().strip()
-    text = re.sub(r"[^a-z0-9]+", '-', text)
-    text = re.sub(r"-+", '-', text).strip('-')
-    return text or 'recipe'
-
-
-def prettify_xml(elem):
-    rough = ET.tostring(elem, encoding='utf-8')
-    parsed = minidom.parseString(rough)
-    return parsed.toprettyxml(indent='  ', encoding='utf-8')
-
-
-def build_recipe_element(data):
-    # Create root with default namespace
-    root = ET.Element('recipe', xmlns=NS)
-
-    title = ET.SubElement(root, 'title')
-    title.text = data.get('title', 'Untitled Recipe')
-
-    description = ET.SubElement(root, 'description')
-    summary = ET.SubElement(description, 'summary')
-    summary.text = data.get('summary', '')
-
-    metadata = ET.SubElement(root, 'metadata')
-    servings = ET.SubElement(metadata, 'servings')
-    servings.text = str(data.get('servings', '4'))
-    totalTime = ET.SubElement(metadata, 'totalTime')
-    totalTime.text = data.get('totalTime', '')
-    difficulty = ET.SubElement(metadata, 'difficulty')
-    difficulty.text = data.get('difficulty', 'medium')
-
-    # Schema expects tags inside description/tags/tag
-    tags = data.get('tags', [])
-    if tags:
-        tags_el = ET.SubElement(description, 'tags')
-        for t in tags:
-            tag_el = ET.SubElement(tags_el, 'tag')
-            tag_el.text = t
+def write_recipe_xml(tree, filename):
+    """Write (or replace) a recipe file atomically"""
+    write_batch(RECIPES_DIR, [(filename, prettify_xml(tree))], replace=True)
+    return os.path.join(RECIPES_DIR, filename)
 
-    ingredients_el = ET.SubElement(root, 'ingredients')
-    for ing in data.get('ingredients', []):
-        i = ET.SubElement(ingredients_el, 'ingredient')
-        i.text = ing
 
-    # include top-level category element for cookbook indexing (placed before preparation per schema)
-    category = ET.SubElement(root, 'category')
-    category.text = data.get('category', 'uncategorized')
+def write_new_recipe_xml(tree, title):
+    """Write a new recipe under a free name derived from its title; return the path.
 
-    preparation_el = ET.SubElement(root, 'preparation')
-    for idx, step in enumerate(data.get('steps', []), start=1):
-        s = ET.SubElement(preparation_el, 'step')
-        s.set('number', str(idx))
-        s.text = step
-
-    # Optionally add created timestamp
-    meta_created = ET.SubElement(root, 'created')
-    meta_created.text = datetime.datetime.utcnow().isoformat() + 'Z'
-
-    return root
-
-
-def write_recipe_xml(elem, filename):
-    path = os.path.join(RECIPES_DIR, filename)
-    xml_bytes = prettify_xml(elem)
-    with open(path, 'wb') as f:
-        f.write(xml_bytes)
-    return path
+    Concurrent submissions of the same title (from any thread or worker
+    process) get <slug>.xml, <slug>-2.xml, ... and never overwrite each other.
+    """
+    filename = write_new_recipe(RECIPES_DIR, slugify(title), prettify_xml(tree))
+    return os.path.join(RECIPES_DIR, filename)
 
 
 def create_sample_recipe():
@@ -109,28 +61,80 @@ def create_sample_recipe():
         'ingredients': ['200g spaghetti', '1 lemon, zested and juiced', '2 tbsp butter', '50g parmesan, grated', 'Salt and pepper to taste'],
         'steps': ['Cook pasta according to package instructions.', 'Reserve some pasta water.', 'Combine lemon, butter, and cheese off heat.', 'Toss pasta with sauce, adding pasta water to loosen.']
     }
-    elem = build_recipe_element(data)
+    tree = build_recipe_tree(recipe_data(data))
     base = slugify(data['title'])
     filename = f"{base}.xml"
-    final_path = write_recipe_xml(elem, filename)
+    final_path = write_recipe_xml(tree, filename)
     print(f"Wrote sample recipe to: {final_path}")
 
 
 # --- Minimal Flask app when requested ---
 
-def run_server(host='127.0.0.1', port=8000):
+def run_server(host='127.0.0.1', port=8000, prewarm=False, cache_size=None):
     try:
-        from flask import Flask, request, render_template_string, redirect, url_for, flash
+        from flask import Flask, request, render_template_string, redirect, url_for, flash, abort, make_response, jsonify
     except Exception:
         print('Flask not installed. Install dependencies with: pip install -r requirements.txt')
         sys.exit(1)
+    try:
+        from recipe_box import create_button_html
+        from recipe_import import FORMATS, detect_format, import_recipes, iter_records
+        from recipe_server import PAGE_CACHE_SIZE, Page, RecipeSite
+        from site_build import WEB_DIR, SiteBuilder
+        from site_watch import next_batch, open_watcher
+    except ImportError:
+        print('lxml not installed. Install dependencies with: pip install -r requirements.txt')
+        sys.exit(1)
 
     app = Flask(__name__)
     app.secret_key = 'dev-secret'
 
-    # compute file URL for the generated recipe homepage
-    recipe_box_path = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'web', 'recipe-box.html'))
-    recipe_home_url = 'file://' + recipe_box_path
+    # recipe pages and the recipe box are rendered from the XML by this server
+    site = RecipeSite(recipes_dir=RECIPES_DIR, cache_size=cache_size or PAGE_CACHE_SIZE)
+    recipe_home_url = '/recipe-box.html'
+    if prewarm:
+        count, seconds = site.prewarm()
+        print(f'Pre-rendered the recipe box and {count} recipe page(s) in {seconds:.2f} s')
+
+    # the static site in web/ is kept current too: created recipes are written
+    # through to their page and the index instead of waiting for a batch rebuild
+    builder = SiteBuilder(RECIPES_DIR, WEB_DIR)
+    builder.create_link = create_button_html(f'http://{host}:{port}/')
+    build_lock = threading.Lock()
+    built, count, errors = builder.rebuild()
+    print(f'Static site: built {built} recipe(s); recipe box has {count} recipes in {WEB_DIR}')
+
+    def follow_recipes(watcher):
+        """Apply recipe files changed outside the server to the static site and the served box"""
+        while True:
+            changed = next_batch(watcher)
+            if changed is None:
+                # events were lost: check everything
+                with build_lock:
+                    builder.rebuild()
+                site.refresh()
+                continue
+            filenames = sorted(os.path.basename(path) for path in changed
+                               if os.path.dirname(path) == RECIPES_DIR and path.endswith('.xml'))
+            if not filenames:
+                continue
+            with build_lock:
+                _, _, errors = builder.rebuild(filenames)
+                recipes = [(f, builder.recipes_by_name.get(f)) for f in filenames]
+            site.record(recipes)
+            for filename, error in errors:
+                print(f'  {filename}: {error}')
+
+    threading.Thread(target=follow_recipes, args=(open_watcher([RECIPES_DIR]),), daemon=True).start()
+
+    def send(page, mimetype='text/html'):
+        """Response for a Page with validators; answers 304 when the client is current"""
+        response = make_response(page.body)
+        response.mimetype = mimetype
+        response.set_etag(page.etag)
+        response.last_modified = datetime.datetime.fromtimestamp(page.last_modified, datetime.timezone.utc)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     FORM_HTML = '''
     <!doctype html>
@@ -173,14 +177,12 @@ def run_server(host='127.0.0.1', port=8000):
         <label>Steps (one per line)<textarea name="steps" rows="6"></textarea></label>
         <button type="submit" style="margin-top:12px;padding:10px 16px">Create</button>
       </form>
-            <p style="margin-top:14px;font-size:0.95em;color:#444">Once you've added recipes, re-run <code>recipe-gen.py</code> and <code>cookbook-pkg.py</code> to regenerate the site.</p>
+            <p style="margin-top:14px;font-size:0.95em;color:#444">New recipes show up right away, both in the recipe box served here and in the static site under <code>web/</code>, as do recipe XML files added or edited in the recipes folder while this server runs.</p>
             <p><a href="#" id="viewHome" style="display:inline-block;margin-top:8px;padding:8px 12px;background:#667eea;color:white;border-radius:8px;text-decoration:none">View Recipe Home</a></p>
             <script>
                 document.getElementById('viewHome').addEventListener('click', function(e){
                     e.preventDefault();
-                    if (confirm('To see newly created recipes you must re-run recipe-gen.py and cookbook-pkg.py. Open the recipe homepage now?')) {
-                        window.open('{{ recipe_home_url }}', '_blank');
-                    }
+                    window.open('{{ recipe_home_url }}', '_blank');
                 });
             </script>
     </body>
@@ -191,30 +193,78 @@ def run_server(host='127.0.0.1', port=8000):
     def index():
         return render_template_string(FORM_HTML, recipe_home_url=recipe_home_url)
 
+    @app.route('/recipe-box.html')
+    def recipe_box():
+        return send(site.box())
+
+    @app.route('/recipes/<slug>')
+    def recipe_page(slug):
+        if slug.endswith('.html'):
+            slug = slug[:-len('.html')]
+        page = site.page(slug)
+        if page is None:
+            abort(404)
+        return send(page)
+
+    @app.route('/index/<filename>')
+    def index_file(filename):
+        found = site.index_file(filename)
+        if found is None:
+            abort(404)
+        content, etag = found
+        return send(Page(content, etag, site.box().last_modified), 'application/javascript')
+
     @app.route('/create', methods=['POST'])
     def create():
-        form = request.form
-        title = form.get('title').strip()
-        data = {
-            'title': title,
-            'summary': form.get('summary','').strip(),
-            'servings': form.get('servings','4').strip(),
-            'totalTime': form.get('totalTime','').strip(),
-            'difficulty': form.get('difficulty','medium').strip(),
-            'tags': [t.strip() for t in form.get('tags','').split(',') if t.strip()],
-            'category': form.get('category','uncategorized').strip(),
-            'ingredients': [l.strip() for l in form.get('ingredients','').splitlines() if l.strip()],
-            'steps': [l.strip() for l in form.get('steps','').splitlines() if l.strip()]
-        }
-        elem = build_recipe_element(data)
-        base = slugify(title)
-        filename = f"{base}.xml"
-        final_path = write_recipe_xml(elem, filename)
-        flash(f'Wrote recipe: {os.path.basename(final_path)}')
+        # the same fields, defaults and element order as a bulk import
+        try:
+            data = recipe_data(request.form.to_dict())
+            tree = build_recipe_tree(data)
+        except ValueError as e:
+            flash(f'Could not create the recipe: {e}')
+            return redirect(url_for('index'))
+        final_path = write_new_recipe_xml(tree, data['title'])
+        filename = os.path.basename(final_path)
+        flash(f'Wrote recipe: {filename}')
+
+        # render, validate and index just this recipe
+        with build_lock:
+            _, _, errors = builder.rebuild([filename])
+            metadata = builder.recipes_by_name.get(filename)
+        site.record([(filename, metadata)])
+        if metadata is None:
+            for _, error in errors:
+                flash(f'Could not build the recipe page: {error}')
+        else:
+            flash(f'Added to the recipe box: {metadata.path}')
+            if not metadata.valid:
+                flash('Does not validate against recipe.xsd: ' + '; '.join(metadata.validationErrors))
         return redirect(url_for('index'))
 
+    @app.route('/import', methods=['POST'])
+    def bulk_import():
+        """Import a JSON Lines or CSV upload (form field "file", or the raw request body)"""
+        upload = request.files.get('file')
+        fmt = request.args.get('format') or (detect_format(upload.filename or '') if upload else 'jsonl')
+        if fmt not in FORMATS:
+            abort(400, f'format must be one of {", ".join(FORMATS)}')
+        stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8', newline='')
+        replace = request.args.get('replace') in ('1', 'true', 'yes')
+        with build_lock:
+            report = import_recipes(iter_records(stream, fmt), RECIPES_DIR, replace=replace)
+            # one incremental index update for the whole import
+            _, _, errors = builder.rebuild(report.imported)
+            imported = [(f, builder.recipes_by_name[f]) for f in report.imported if f in builder.recipes_by_name]
+        site.record(imported)
+        result = report.as_dict()
+        result['buildErrors'] = [{'file': f, 'error': error} for f, error in errors]
+        return jsonify(result)
+
     print(f"Starting server on http://{host}:{port} — recipes dir: {RECIPES_DIR}")
-    app.run(host=host, port=port)
+    try:
+        app.run(host=host, port=port)
+    finally:
+        builder.close()
 
 
 if __name__ == '__main__':
@@ -223,6 +273,8 @@ if __name__ == '__main__':
     parser.add_argument('--serve', action='store_true', help='Run simple Flask server for creating recipes')
     parser.add_argument('--host', default='127.0.0.1')
     parser.add_argument('--port', default=8000, type=int)
+    parser.add_argument('--prewarm', action='store_true', help='Render the recipe box and every recipe page into the cache at startup')
+    parser.add_argument('--cache-size', type=int, help='Rendered pages kept in memory (default: 2048)')
     args = parser.parse_args()
 
     if args.create_sample:
@@ -230,7 +282,7 @@ if __name__ == '__main__':
         sys.exit(0)
 
     if args.serve:
-        run_server(host=args.host, port=args.port)
+        run_server(host=args.host, port=args.port, prewarm=args.prewarm, cache_size=args.cache_size)
         sys.exit(0)
 
     parser.print_help()
@@ -0,0 +1,1139 @@
+"""
+Recipe box page (recipe-box.html) rendering shared by cookbook-pkg.py and
+the unified site build.
+"""
+import os
+import json
+import time
+import threading
+import urllib.request
+import urllib.error
+
+from build_profile import NULL_PROFILER
+from recipe_index import INDEX_DIR_NAME, write_if_changed, write_index
+
+DEFAULT_SERVER_URL = 'http://127.0.0.1:8000/'
+CREATE_LINK_MODES = ('client', 'probe', 'force', 'none')
+PROBE_CACHE_NAME = '.server-probe.json'
+PROBE_TTL_SECONDS = 60
+# Card rendering: only the rows near the viewport are in the DOM, so cards
+# have a fixed height (their text is clamped) and the grid geometry is known
+RENDER_CONFIG = {
+    'virtual': True,  # False renders every matching card (the benchmark baseline)
+    'cardHeight': 260,
+    'cardMinWidth': 350,
+    'gap': 25,
+    'overscanRows': 2,  # rows rendered beyond each edge of the viewport
+    'debounceMs': 150,  # search and pantry input settle time before filtering
+}
+
+
+def server_is_up(url):
+    """Return True if the recipe generator server answers a HEAD request"""
+    try:
+        req = urllib.request.Request(url, method='HEAD')
+        with urllib.request.urlopen(req, timeout=1) as resp:
+            return getattr(resp, 'status', 200) < 400
+    except Exception:
+        return False
+
+
+def generator_url(server_url=None):
+    """The generator server URL (RECIPE_GENERATOR_URL overrides the default)"""
+    return server_url or os.environ.get('RECIPE_GENERATOR_URL', DEFAULT_SERVER_URL)
+
+
+def create_link_html(mode='client', server_url=None):
+    """Return the "Create Recipe" link markup for a CREATE_LINK_MODES mode.
+
+    client: always in the page, shown once the browser has reached the
+    server, so the build itself never touches the network. probe: only if
+    the server answers now (blocking; see ServerProbe for a background,
+    cached check). force: always shown. none: left out.
+    """
+    url = generator_url(server_url)
+    if mode == 'client':
+        return create_button_html(url, check=True)
+    if mode == 'force' or (mode == 'probe' and server_is_up(url)):
+        return create_button_html(url)
+    return ''
+
+
+def create_button_html(url, check=False):
+    """The "Create Recipe" link markup; with check it stays hidden until the page reaches url"""
+    probe = ' data-probe hidden' if check else ''
+    return f'<a class="create-btn" href="{url}" target="_blank" rel="noopener"{probe}>＋ Create Recipe</a>'
+
+
+class ServerProbe:
+    """Check whether the generator server is up in a background thread.
+
+    The check starts on construction so it overlaps the recipe scan. Its
+    answer is kept in cache_path (the web directory's PROBE_CACHE_NAME) for
+    ttl seconds, so builds in quick succession don't each wait on it.
+    """
+
+    def __init__(self, server_url=None, cache_path=None, ttl=PROBE_TTL_SECONDS):
+        self.url = generator_url(server_url)
+        self.cache_path = cache_path
+        self.up = self._cached(ttl)
+        self._thread = None
+        if self.up is None:
+            self._thread = threading.Thread(target=self._check, daemon=True)
+            self._thread.start()
+
+    def _cached(self, ttl):
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') == self.url and 0 <= time.time() - entry.get('checked', 0) < ttl:
+            return entry.get('up')
+        return None
+
+    def _check(self):
+        self.up = server_is_up(self.url)
+
+    def result(self):
+        """Wait for the check; return True if the server answered"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if self.cache_path is not None:
+                entry = {'url': self.url, 'up': self.up, 'checked': time.time()}
+                try:
+                    write_if_changed(self.cache_path, json.dumps(entry).encode('utf-8'))
+                except OSError:
+                    pass
+        return self.up
+
+    def link_html(self):
+        return create_button_html(self.url) if self.result() else ''
+
+
+def _box_css(render):
+    return f"""
+        * {{
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }}
+
+        body {{
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 20px;
+        }}
+
+        .container {{
+            max-width: 1400px;
+            margin: 0 auto;
+        }}
+
+        header {{
+            text-align: center;
+            color: white;
+            margin-bottom: 40px;
+        }}
+
+        h1 {{
+            font-size: 3em;
+            margin-bottom: 10px;
+            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
+        }}
+
+        .subtitle {{
+            font-size: 1.2em;
+            opacity: 0.9;
+        }}
+
+        .create-btn {{
+            display: inline-block;
+            margin-top: 12px;
+            padding: 8px 12px;
+            background: white;
+            color: #667eea;
+            border-radius: 8px;
+            font-weight: 600;
+            text-decoration: none;
+            box-shadow: 0 6px 18px rgba(0,0,0,0.12);
+        }}
+
+        .create-btn[hidden] {{
+            display: none;
+        }}
+
+        .create-btn:hover {{
+            transform: translateY(-2px);
+            box-shadow: 0 10px 25px rgba(0,0,0,0.15);
+        }}
+
+        .footer-section {{
+            text-align: center;
+            margin-top: 40px;
+            padding: 30px 0;
+        }}
+
+        .search-section {{
+            background: white;
+            border-radius: 15px;
+            padding: 30px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.3);
+            margin-bottom: 30px;
+        }}
+
+        .search-bar {{
+            display: flex;
+            gap: 10px;
+            margin-bottom: 20px;
+        }}
+
+        .search-input {{
+            flex: 1;
+            padding: 15px 20px;
+            font-size: 1.1em;
+            border: 2px solid #e0e0e0;
+            border-radius: 10px;
+            transition: border-color 0.3s;
+        }}
+
+        .pantry-input {{
+            width: 100%;
+            padding: 8px 12px;
+            font-size: 0.95em;
+            border: 2px solid #e0e0e0;
+            border-radius: 10px;
+        }}
+
+        .pantry-input:focus {{
+            outline: none;
+            border-color: #667eea;
+        }}
+
+        .search-input:focus {{
+            outline: none;
+            border-color: #667eea;
+        }}
+
+        .search-btn {{
+            padding: 15px 40px;
+            font-size: 1.1em;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            border: none;
+            border-radius: 10px;
+            cursor: pointer;
+            font-weight: bold;
+            transition: transform 0.2s;
+        }}
+
+        .search-btn:hover {{
+            transform: scale(1.05);
+        }}
+
+        .filters {{
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+            gap: 15px;
+        }}
+
+        .filter-group {{
+            background: #f8f9fa;
+            padding: 15px;
+            border-radius: 10px;
+        }}
+
+        .filter-group h3 {{
+            font-size: 0.9em;
+            color: #666;
+            margin-bottom: 10px;
+            text-transform: uppercase;
+            letter-spacing: 0.5px;
+        }}
+
+        .tag-container {{
+            display: flex;
+            flex-wrap: wrap;
+            gap: 8px;
+        }}
+
+        .tag {{
+            padding: 6px 12px;
+            border-radius: 20px;
+            font-size: 0.9em;
+            cursor: pointer;
+            transition: all 0.3s;
+            background: white;
+            border: 2px solid #e0e0e0;
+        }}
+
+        .tag:hover {{
+            border-color: #667eea;
+            transform: translateY(-2px);
+        }}
+
+        .tag.active {{
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            border-color: transparent;
+        }}
+
+        .tag.empty {{
+            opacity: 0.4;
+        }}
+
+        .tag-count {{
+            margin-left: 4px;
+            font-size: 0.85em;
+            opacity: 0.7;
+        }}
+
+        .results-section {{
+            display: grid;
+            grid-template-columns: repeat(auto-fill, minmax({render['cardMinWidth']}px, 1fr));
+            gap: {render['gap']}px;
+        }}
+
+        .recipe-card {{
+            height: {render['cardHeight']}px;
+            overflow: hidden;
+            background: white;
+            border-radius: 15px;
+            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
+            transition: transform 0.3s, box-shadow 0.3s;
+            cursor: pointer;
+        }}
+
+        .recipe-card:hover {{
+            transform: translateY(-5px);
+            box-shadow: 0 10px 25px rgba(0,0,0,0.3);
+        }}
+
+
+        .recipe-content {{
+                padding: 15px;
+        }}
+
+        .recipe-title {{
+                font-size: 1.2em;
+            color: #333;
+                margin-bottom: 8px;
+            font-weight: bold;
+            display: -webkit-box;
+            -webkit-line-clamp: 2;
+            -webkit-box-orient: vertical;
+            overflow: hidden;
+        }}
+
+        .recipe-description {{
+            color: #666;
+            font-size: 0.9em;
+            margin-top: 8px;
+            line-height: 1.4;
+            display: -webkit-box;
+            -webkit-line-clamp: 3;
+            -webkit-box-orient: vertical;
+            overflow: hidden;
+        }}
+
+        .recipe-meta {{
+            display: flex;
+            gap: 15px;
+                margin: 8px 0;
+            flex-wrap: wrap;
+        }}
+
+        .meta-item {{
+            display: flex;
+            align-items: center;
+            gap: 5px;
+                font-size: 0.85em;
+            color: #666;
+        }}
+
+        .recipe-tags {{
+            display: flex;
+            flex-wrap: wrap;
+            height: 26px;
+            overflow: hidden;
+            gap: 6px;
+                margin-bottom: 8px;
+        }}
+
+        .recipe-tag {{
+            padding: 4px 10px;
+                background: #e8ebff;
+                color: #667eea;
+            border-radius: 15px;
+            font-size: 0.8em;
+        }}
+
+        .stats {{
+            display: flex;
+            justify-content: space-around;
+            background: white;
+            border-radius: 15px;
+            padding: 20px;
+            margin-bottom: 30px;
+            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
+        }}
+
+        .stat-item {{
+            text-align: center;
+        }}
+
+        .stat-number {{
+            font-size: 2em;
+            font-weight: bold;
+            color: #667eea;
+        }}
+
+        .stat-label {{
+            color: #666;
+            font-size: 0.9em;
+            margin-top: 5px;
+        }}
+
+        .no-results {{
+            grid-column: 1 / -1;
+            text-align: center;
+            padding: 60px;
+            background: white;
+            border-radius: 15px;
+            color: #666;
+            font-size: 1.2em;
+        }}
+"""
+
+
+# The recipe box code; it reads INDEX and RENDER from the inline script before it
+BOX_SCRIPT = """
+        const recipes = [];
+        const shardRows = [];
+        const shardAppended = [];
+        const shardPromises = {};
+        let allShardsPromise = null;
+        let appendedPromise = null;
+        let appendedEntries = [];
+        let validationErrors = {};
+        let validationPromise = null;
+
+        let currentRecipes = recipes;
+
+        // Index files call back into RecipeIndex when their <script> tag runs
+        window.RecipeIndex = {
+            addShard(n, rows, appended) {
+                shardRows[n] = rows.map((row, i) => decodeRecipe(row, n * INDEX.shardSize + i));
+                if (appended) shardAppended[n] = appended;
+            },
+            addValidation(errors) {
+                validationErrors = errors;
+            }
+        };
+
+        function decodeRecipe(row, num) {
+            const recipe = { num };
+            INDEX.fields.forEach((field, i) => recipe[field] = row[i]);
+            recipe.path = `recipes/${recipe.id}.html`;
+            return recipe;
+        }
+
+        function loadScript(src) {
+            return new Promise((resolve, reject) => {
+                const script = document.createElement('script');
+                script.src = src;
+                script.onload = resolve;
+                script.onerror = reject;
+                document.head.appendChild(script);
+            });
+        }
+
+        function loadShard(n) {
+            if (!shardPromises[n]) {
+                shardPromises[n] = loadScript(INDEX.base + INDEX.shards[n].file);
+            }
+            return shardPromises[n];
+        }
+
+        function rebuildRecipes() {
+            // recipes holds the contiguous run of loaded shards, in id order
+            recipes.length = 0;
+            for (let n = 0; n < INDEX.shards.length && shardRows[n]; n++) {
+                shardRows[n].forEach(recipe => recipes.push(recipe));
+            }
+        }
+
+        function loadAllShards() {
+            if (!allShardsPromise) {
+                allShardsPromise = INDEX.shards.reduce(
+                    (promise, shard, n) => promise.then(() => loadShard(n)).then(rebuildRecipes),
+                    Promise.resolve());
+            }
+            return allShardsPromise;
+        }
+
+        function loadAppended() {
+            // recipes appended since the search, ingredient and facet files were written
+            // carry their terms, ingredient names and facet keys in their shard (see recipe_index.py)
+            if (!appendedPromise) {
+                const loads = [];
+                for (let n = Math.floor(INDEX.appendedFrom / INDEX.shardSize); n < INDEX.shards.length; n++) {
+                    loads.push(loadShard(n));
+                }
+                appendedPromise = Promise.all(loads).then(() => appendedEntries = shardAppended.filter(Boolean));
+            }
+            return appendedPromise;
+        }
+
+        function loadValidation() {
+            if (!validationPromise) {
+                validationPromise = loadScript(INDEX.base + INDEX.validation);
+            }
+            return validationPromise;
+        }
+
+        function updateStats() {
+            const totalTagsEl = document.getElementById('totalTags');
+            const categoriesEl = document.getElementById('categories');
+            if (totalTagsEl) totalTagsEl.textContent = facets.tag.values.length;
+            if (categoriesEl) categoriesEl.textContent = facets.category.values.length;
+        }
+
+        // --- Filter facets over precomputed id sets (see facet_index.py) ---
+        // Chosen values OR within a facet and AND across facets; each value's
+        // count is taken against the other facets' selection and the query.
+
+        const FACET_LABELS = {
+            difficulty: value => value.charAt(0).toUpperCase() + value.slice(1),
+            time: value => ({quick: 'Under 30 min', medium: '30-60 min', long: 'Over 1 hour'})[value] || value,
+            servings: value => `${value} servings`,
+        };
+        const TAG_CHIPS = 20;  // most used tags offered as chips
+        let facets = null;
+        let facetPromise = null;
+        let facetWords = 0;
+        const activeFacets = {};  // facet name -> Set of chosen value positions
+
+        RecipeIndex.addFacets = function(payload) {
+            // sized for appended recipes too, which facets.js does not count
+            facetWords = (INDEX.count + 31) >> 5;
+            facets = payload.facets;
+            Object.keys(facets).forEach(name => {
+                const facet = facets[name];
+                facet.sets = facet.sets.map(decodeSet);
+                facet.current = facet.counts.slice();
+                activeFacets[name] = new Set();
+            });
+        };
+
+        function loadFacets() {
+            if (!facetPromise) {
+                facetPromise = Promise.all([loadScript(INDEX.base + INDEX.facets), loadAppended()])
+                    .then(([, appended]) => appended.forEach(addAppendedFacets));
+            }
+            return facetPromise;
+        }
+
+        function addAppendedFacets(appended) {
+            appended.facets.forEach((keys, i) => {
+                const id = appended.first + i;
+                keys.forEach(([name, value]) => {
+                    const facet = facets[name];
+                    let v = facet.values.indexOf(value);
+                    if (v < 0) {
+                        v = facet.values.push(value) - 1;
+                        facet.counts.push(0);
+                        facet.current.push(0);
+                        facet.sets.push({ ids: new Uint32Array(0) });
+                    }
+                    const set = facet.sets[v];
+                    if (set.bits) {
+                        set.bits[id >> 5] |= 1 << (id & 31);
+                    } else {
+                        const ids = new Uint32Array(set.ids.length + 1);
+                        ids.set(set.ids);
+                        ids[set.ids.length] = id;
+                        set.ids = ids;
+                    }
+                    facet.counts[v]++;
+                    facet.current[v]++;
+                });
+            });
+        }
+
+        function decodeSet(set) {
+            // dense sets arrive as base64 bitmaps, sparse ones as delta-encoded ids
+            if (typeof set !== 'string') {
+                const ids = new Uint32Array(set.length);
+                let id = 0;
+                set.forEach((delta, i) => ids[i] = id += delta);
+                return { ids };
+            }
+            const bytes = atob(set);
+            const bits = new Uint32Array(facetWords);
+            for (let i = 0; i < bytes.length; i++) bits[i >> 2] |= bytes.charCodeAt(i) << ((i & 3) << 3);
+            return { bits };
+        }
+
+        function popcount(x) {
+            x -= (x >>> 1) & 0x55555555;
+            x = (x & 0x33333333) + ((x >>> 2) & 0x33333333);
+            return Math.imul((x + (x >>> 4)) & 0x0f0f0f0f, 0x01010101) >>> 24;
+        }
+
+        function hasBit(bits, id) {
+            return (bits[id >> 5] >>> (id & 31)) & 1;
+        }
+
+        function countIn(set, bits) {
+            let n = 0;
+            if (set.ids) {
+                set.ids.forEach(id => n += hasBit(bits, id));
+            } else {
+                for (let w = 0; w < facetWords; w++) n += popcount(set.bits[w] & bits[w]);
+            }
+            return n;
+        }
+
+        function orInto(bits, set) {
+            if (set.ids) {
+                set.ids.forEach(id => bits[id >> 5] |= 1 << (id & 31));
+            } else {
+                for (let w = 0; w < facetWords; w++) bits[w] |= set.bits[w];
+            }
+        }
+
+        function andBits(a, b) {
+            if (a === null || b === null) return a === null ? b : a;
+            const bits = new Uint32Array(facetWords);
+            for (let w = 0; w < facetWords; w++) bits[w] = a[w] & b[w];
+            return bits;
+        }
+
+        function idsToBits(ids) {
+            const bits = new Uint32Array(facetWords);
+            ids.forEach(id => bits[id >> 5] |= 1 << (id & 31));
+            return bits;
+        }
+
+        function bitsToIds(bits) {
+            const ids = [];
+            for (let w = 0; w < facetWords; w++) {
+                for (let word = bits[w]; word; word &= word - 1) {
+                    ids.push((w << 5) + 31 - Math.clz32(word & -word));
+                }
+            }
+            return ids;
+        }
+
+        function facetSelection(skip) {
+            // bitmap of the recipes the chosen values allow, ignoring facet skip; null if unconstrained
+            let selection = null;
+            Object.keys(activeFacets).forEach(name => {
+                if (name === skip || !activeFacets[name].size) return;
+                const union = new Uint32Array(facetWords);
+                activeFacets[name].forEach(i => orInto(union, facets[name].sets[i]));
+                selection = andBits(selection, union);
+            });
+            return selection;
+        }
+
+        function updateFacetCounts(matchBits) {
+            Object.keys(facets).forEach(name => {
+                const facet = facets[name];
+                const base = andBits(facetSelection(name), matchBits);
+                facet.current = base === null ? facet.counts.slice() : facet.sets.map(set => countIn(set, base));
+            });
+            renderFacets();
+        }
+
+        function renderFacets() {
+            Object.keys(facets).forEach(name => {
+                const facet = facets[name];
+                const active = activeFacets[name];
+                let positions = facet.values.map((value, i) => i);
+                if (name === 'tag') {
+                    positions.sort((a, b) => facet.current[b] - facet.current[a] || a - b);
+                    positions = positions.filter((i, rank) => rank < TAG_CHIPS || active.has(i));
+                }
+                const label = FACET_LABELS[name] || (value => value);
+                document.getElementById('facet-' + name).innerHTML = positions.map(i => `
+                    <span class="tag${active.has(i) ? ' active' : ''}${facet.current[i] ? '' : ' empty'}" data-facet="${name}" data-value="${i}">${label(facet.values[i])}<span class="tag-count">${facet.current[i]}</span></span>`).join('');
+            });
+        }
+
+        document.getElementById('filters').addEventListener('click', event => {
+            const chip = event.target.closest('[data-facet]');
+            if (!chip) return;
+            const active = activeFacets[chip.dataset.facet];
+            const i = Number(chip.dataset.value);
+            if (active.has(i)) active.delete(i); else active.add(i);
+            filterRecipes();
+        });
+
+        // --- Full-text search over the inverted index (see search_index.py) ---
+
+        const termShards = {};
+        const termShardPromises = {};
+        let searchSeq = 0;
+
+        RecipeIndex.addTerms = function(key, terms, postings) {
+            termShards[key] = { terms, postings };
+        };
+
+        function tokenize(text) {
+            const tokens = text.toLowerCase().split(/[^\\p{L}\\p{N}]+/u).filter(Boolean);
+            // the last token may still be being typed, so it is kept even if it is a stopword
+            return tokens.filter((token, i) => i === tokens.length - 1 || !INDEX.search.stopwords.includes(token));
+        }
+
+        function termShardKey(token) {
+            return /[a-z0-9]/.test(token[0]) ? token[0] : '_';
+        }
+
+        function loadTermShard(key) {
+            if (!termShardPromises[key]) {
+                termShardPromises[key] = INDEX.search.keys.includes(key)
+                    ? loadScript(INDEX.base + INDEX.search.prefix + key + '.js')
+                    : Promise.resolve();
+            }
+            return termShardPromises[key];
+        }
+
+        function lowerBound(sorted, value) {
+            let lo = 0, hi = sorted.length;
+            while (lo < hi) {
+                const mid = (lo + hi) >> 1;
+                if (sorted[mid] < value) lo = mid + 1; else hi = mid;
+            }
+            return lo;
+        }
+
+        function prefixPostings(token) {
+            // union of the posting lists of every term starting with token
+            const ids = new Set();
+            appendedEntries.forEach(appended => appended.terms.forEach((terms, i) => {
+                if (terms.some(term => term.startsWith(token))) ids.add(appended.first + i);
+            }));
+            const shard = termShards[termShardKey(token)];
+            if (!shard) return ids;
+            for (let i = lowerBound(shard.terms, token); i < shard.terms.length && shard.terms[i].startsWith(token); i++) {
+                let id = 0;
+                shard.postings[i].forEach(delta => {
+                    id += delta;
+                    ids.add(id);
+                });
+            }
+            return ids;
+        }
+
+        function searchIds(tokens) {
+            const loads = tokens.map(token => loadTermShard(termShardKey(token)));
+            return Promise.all(loads.concat([loadAppended()])).then(() => {
+                let result = null;
+                tokens.map(prefixPostings).sort((a, b) => a.size - b.size).forEach(ids => {
+                    result = result === null ? ids : new Set(Array.from(result).filter(id => ids.has(id)));
+                });
+                return Array.from(result || []).sort((a, b) => a - b);
+            });
+        }
+
+        function recipesForIds(ids) {
+            const shardNumbers = new Set(ids.map(id => Math.floor(id / INDEX.shardSize)));
+            return Promise.all(Array.from(shardNumbers).map(loadShard)).then(() =>
+                ids.map(id => shardRows[Math.floor(id / INDEX.shardSize)][id % INDEX.shardSize]));
+        }
+
+        // --- "Cook with what I have" over the ingredient index (see ingredient_index.py) ---
+
+        let ingredientIndex = null;
+        let ingredientPromise = null;
+        const pantryHave = new Map();
+
+        RecipeIndex.addIngredients = function(payload) {
+            ingredientIndex = payload;
+            ingredientIndex.lookup = new Map(payload.names.map((name, i) => [name, i]));
+            ingredientIndex.units = new Set(payload.rules.units);
+            ingredientIndex.skip = new Set(payload.rules.descriptors.concat(payload.rules.fillers));
+        };
+
+        function loadIngredients() {
+            if (!ingredientPromise) {
+                ingredientPromise = Promise.all([loadScript(INDEX.base + INDEX.ingredients), loadAppended()])
+                    .then(([, appended]) => appended.forEach(addAppendedIngredients));
+            }
+            return ingredientPromise;
+        }
+
+        function addAppendedIngredients(appended) {
+            // same merge as read_ingredients() in recipe_index.py
+            const index = ingredientIndex;
+            appended.ingredients.forEach((names, i) => {
+                const id = appended.first + i;
+                names.forEach(name => {
+                    let n = index.lookup.get(name);
+                    if (n === undefined) {
+                        n = index.names.push(name) - 1;
+                        index.postings.push([]);
+                        index.lookup.set(name, n);
+                    }
+                    const deltas = index.postings[n];
+                    deltas.push(id - deltas.reduce((sum, delta) => sum + delta, 0));
+                });
+                index.totals[id] = names.length;
+            });
+        }
+
+        function singularize(word) {
+            if (word.length <= 3 || /(ss|us|is)$/.test(word)) return word;
+            if (word.endsWith('ies')) return word.slice(0, -3) + 'y';
+            if (/(oes|ches|shes|xes)$/.test(word)) return word.slice(0, -2);
+            if (word.endsWith('s')) return word.slice(0, -1);
+            return word;
+        }
+
+        // port of normalize_ingredient() in ingredient_index.py
+        function normalizeIngredient(text) {
+            const head = text.toLowerCase().replace(/\\([^)]*\\)/g, ' ').split(/[,;:]/)[0];
+            return (' ' + head + ' ').split(/\\s(?:and|or|&|plus)\\s/).map(part => {
+                const words = (part.match(/[a-z]+(?:'[a-z]+)?/g) || []).filter(word =>
+                    !ingredientIndex.units.has(singularize(word)) && !ingredientIndex.skip.has(word));
+                if (words.length) words[words.length - 1] = singularize(words[words.length - 1]);
+                return words.join(' ');
+            }).filter(Boolean);
+        }
+
+        function pantryItems() {
+            return document.getElementById('pantryInput').value.split(',').map(item => item.trim()).filter(Boolean);
+        }
+
+        function pantryRank(items) {
+            // ids of recipes using any pantry ingredient, fewest missing ingredients first
+            return loadIngredients().then(() => {
+                const names = new Set();
+                items.forEach(item => normalizeIngredient(item).forEach(name => {
+                    if (ingredientIndex.lookup.has(name)) names.add(ingredientIndex.lookup.get(name));
+                }));
+
+                const totals = ingredientIndex.totals;
+                const have = new Uint8Array(totals.length);
+                const ids = [];
+                names.forEach(n => {
+                    let id = 0;
+                    ingredientIndex.postings[n].forEach(delta => {
+                        id += delta;
+                        if (have[id]++ === 0) ids.push(id);
+                    });
+                });
+                ids.sort((a, b) => (totals[a] - have[a]) - (totals[b] - have[b]) || have[b] - have[a] || a - b);
+
+                pantryHave.clear();
+                ids.forEach(id => pantryHave.set(id, have[id] + '/' + totals[id]));
+                return ids;
+            });
+        }
+
+        function filterRecipes() {
+            const tokens = tokenize(document.getElementById('searchInput').value);
+            const seq = ++searchSeq;
+            const pantry = pantryItems();
+            let candidates = tokens.length ? searchIds(tokens) : Promise.resolve(null);
+            if (pantry.length) {
+                // pantry ranking decides the order; a search query narrows it
+                candidates = Promise.all([candidates, pantryRank(pantry)]).then(([ids, ranked]) => {
+                    if (ids === null) return ranked;
+                    const matching = new Set(ids);
+                    return ranked.filter(id => matching.has(id));
+                });
+            } else {
+                pantryHave.clear();
+            }
+            candidates = candidates.then(ids => {
+                if (facets === null || seq !== searchSeq) return ids;
+                // facet filtering and counts are bitmap operations over recipe ids
+                updateFacetCounts(ids === null ? null : idsToBits(ids));
+                const selection = facetSelection(null);
+                if (selection === null) return ids;
+                return ids === null ? bitsToIds(selection) : ids.filter(id => hasBit(selection, id));
+            }).then(ids => ids === null ? recipes : recipesForIds(ids));
+
+            candidates.then(matches => {
+                // a newer keystroke has superseded this query
+                if (seq !== searchSeq) return;
+
+                currentRecipes = matches;
+                displayRecipes();
+            });
+        }
+
+        // --- Card rendering: only the rows near the viewport, on a reused pool of nodes ---
+
+        const cardPool = [];
+        let displayQueued = false;
+        let filterTimer = null;
+
+        function displayRecipes() {
+            displayQueued = false;
+            const viewport = document.getElementById('resultsViewport');
+            const resultsContainer = document.getElementById('results');
+            document.getElementById('noResults').hidden = currentRecipes.length > 0;
+
+            const columns = Math.max(1, Math.floor((resultsContainer.clientWidth + RENDER.gap) / (RENDER.cardMinWidth + RENDER.gap)));
+            const rowHeight = RENDER.cardHeight + RENDER.gap;
+            const rows = Math.ceil(currentRecipes.length / columns);
+            let first = 0, last = rows;
+            if (RENDER.virtual) {
+                const top = viewport.getBoundingClientRect().top;
+                last = Math.min(rows, Math.ceil((window.innerHeight - top) / rowHeight) + RENDER.overscanRows);
+                first = Math.min(last, Math.max(0, Math.floor(-top / rowHeight) - RENDER.overscanRows));
+            }
+            // the viewport keeps the height of every row; the grid holds the rendered ones
+            viewport.style.paddingTop = first * rowHeight + 'px';
+            viewport.style.height = rows ? rows * rowHeight - RENDER.gap + 'px' : '';
+
+            const start = first * columns;
+            const end = Math.min(currentRecipes.length, last * columns);
+            while (cardPool.length < end - start) {
+                const card = document.createElement('div');
+                card.className = 'recipe-card';
+                cardPool.push(resultsContainer.appendChild(card));
+            }
+            // recipe i always lands in pool slot i % size, so a scroll by one row
+            // only rewrites the cards entering the window; order keeps the grid sorted
+            const size = cardPool.length;
+            cardPool.forEach((card, slot) => {
+                card.hidden = (slot - start % size + size) % size >= end - start;
+            });
+            for (let i = start; i < end; i++) {
+                const card = cardPool[i % size];
+                const recipe = currentRecipes[i];
+                const key = recipe.num + '/' + (pantryHave.get(recipe.num) || '');
+                if (card.recipeKey !== key) {
+                    card.recipeKey = key;
+                    card.dataset.path = recipe.path;
+                    card.innerHTML = cardHtml(recipe);
+                }
+                card.style.order = i - start;
+            }
+        }
+
+        function scheduleDisplay() {
+            if (!displayQueued) {
+                displayQueued = true;
+                requestAnimationFrame(displayRecipes);
+            }
+        }
+
+        function scheduleFilter() {
+            clearTimeout(filterTimer);
+            filterTimer = setTimeout(filterRecipes, RENDER.debounceMs);
+        }
+
+        function cardHtml(recipe) {
+            return `
+                    <div class="recipe-content">
+                            <div class="recipe-tags">
+                                ${recipe.tags.slice(0, 3).map(tag => `<span class="recipe-tag">${tag}</span>`).join('')}
+                            </div>
+                        <div class="recipe-title">${recipe.title}</div>
+                        <div class="recipe-meta">
+                            <span class="meta-item">⏱️ ${recipe.totalTimeDisplay}</span>
+                            <span class="meta-item">📊 ${recipe.difficulty}</span>
+                            ${pantryHave.has(recipe.num)
+                                ? `<span class="meta-item">🥕 ${pantryHave.get(recipe.num)} ingredients</span>`
+                                : `<span class="meta-item">🧂 ${recipe.ingredientCount} ingredients</span>`}
+                            <span class="meta-item">📝 ${recipe.stepCount} steps</span>
+                            ${recipe.valid ? '' : `<span class="meta-item" data-invalid="${recipe.id}" style="color:#d32f2f">⚠️ Invalid</span>`}
+                        </div>
+                            <p class="recipe-description">${recipe.description.substring(0, 120)}...</p>
+                    </div>`;
+        }
+
+        function searchRecipes() {
+            clearTimeout(filterTimer);
+            filterRecipes();
+        }
+
+        function openRecipe(path) {
+            window.location.href = path;
+        }
+
+        document.getElementById('searchInput').addEventListener('input', scheduleFilter);
+        document.getElementById('pantryInput').addEventListener('input', scheduleFilter);
+        window.addEventListener('scroll', scheduleDisplay, {passive: true});
+        window.addEventListener('resize', scheduleDisplay);
+
+        document.getElementById('results').addEventListener('click', event => {
+            const card = event.target.closest('.recipe-card');
+            if (card) openRecipe(card.dataset.path);
+        });
+
+        // Validation details are only loaded when an "Invalid" badge is hovered
+        document.getElementById('results').addEventListener('mouseover', event => {
+            const badge = event.target.closest('[data-invalid]');
+            if (!badge || badge.title) return;
+            loadValidation().then(() => {
+                badge.title = (validationErrors[badge.dataset.invalid] || []).join(' | ');
+            });
+        });
+
+        // A "Create Recipe" link from a static build is shown once its server answers
+        document.querySelectorAll('.create-btn[data-probe]').forEach(link => {
+            const controller = new AbortController();
+            setTimeout(() => controller.abort(), 2000);
+            fetch(link.href, {method: 'HEAD', mode: 'no-cors', cache: 'no-store', signal: controller.signal})
+                .then(() => { link.hidden = false; }, () => {});
+        });
+
+        loadFacets().then(() => {
+            updateStats();
+            filterRecipes();
+        });
+        if (INDEX.shards.length) {
+            // First paint from the first shard, then pull in the rest when idle
+            loadShard(0).then(() => {
+                rebuildRecipes();
+                filterRecipes();
+                (window.requestIdleCallback || setTimeout)(() => {
+                    loadAllShards().then(filterRecipes);
+                });
+            });
+        } else {
+            displayRecipes();
+        }
+"""
+
+
+def box_assets(render_config=None):
+    """The recipe box's stylesheet and script as {'.css': text, '.js': text}"""
+    render = {**RENDER_CONFIG, **(render_config or {})}
+    return {'.css': _box_css(render), '.js': BOX_SCRIPT}
+
+
+def render_recipe_box(index_manifest, create_link_html='', render_config=None, extra_script='', asset_urls=None):
+    """Return the recipe-box.html page for a sharded index manifest.
+
+    render_config overrides entries of RENDER_CONFIG; extra_script is run
+    after the page's own script (recipe-bench.py uses it for its frame-time
+    driver). asset_urls maps '.css' and '.js' to the URLs of box_assets()
+    written as files; without it they are inlined.
+    """
+    render = {**RENDER_CONFIG, **(render_config or {})}
+    if asset_urls:
+        style = f'<link rel="stylesheet" href="{asset_urls[".css"]}">'
+        script = f'<script src="{asset_urls[".js"]}"></script>'
+    else:
+        parts = box_assets(render_config)
+        style = f'<style>{parts[".css"]}    </style>'
+        script = f'<script>{parts[".js"]}    </script>'
+    if extra_script:
+        extra_script = f'\n    <script>\n{extra_script}\n    </script>'
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Recipe Collection - Search & Browse</title>
+    {style}
+</head>
+<body>
+    <div class="container">
+        <header>
+            <h1>🍳 My Recipe Collection</h1>
+            <p class="subtitle">Search and browse your personal recipe library</p>
+        </header>
+
+        <div class="stats">
+        <div class="search-section">
+            <div class="search-bar">
+                <input type="text" class="search-input" id="searchInput" placeholder="Search recipes by name, ingredient, or description...">
+                <button class="search-btn" onclick="searchRecipes()">Search</button>
+            </div>
+
+            <div class="filters" id="filters">
+                <div class="filter-group">
+                    <h3>Difficulty</h3>
+                    <div class="tag-container" id="facet-difficulty"></div>
+                </div>
+
+                <div class="filter-group">
+                    <h3>Cooking Time</h3>
+                    <div class="tag-container" id="facet-time"></div>
+                </div>
+
+                <div class="filter-group">
+                    <h3>Category</h3>
+                    <div class="tag-container" id="facet-category"></div>
+                </div>
+
+                <div class="filter-group">
+                    <h3>Tags</h3>
+                    <div class="tag-container" id="facet-tag"></div>
+                </div>
+
+                <div class="filter-group">
+                    <h3>Servings</h3>
+                    <div class="tag-container" id="facet-servings"></div>
+                </div>
+
+                <div class="filter-group">
+                    <h3>Cook With What I Have</h3>
+                    <input type="text" class="pantry-input" id="pantryInput" placeholder="e.g. onion, garlic, rice">
+                </div>
+            </div>
+        </div>
+
+        <div id="resultsViewport">
+            <div class="results-section" id="results">
+                <div class="no-results" id="noResults" hidden>No recipes found. Try adjusting your search or filters.</div>
+                <!-- Recipe cards generated by JavaScript -->
+            </div>
+        </div>
+
+        <div class="footer-section">
+            {create_link_html}
+        </div>
+    </div>
+
+    <script>
+        // Recipe metadata is loaded lazily from the sharded index (see recipe_index.py)
+        const INDEX = {json.dumps(index_manifest)};
+        const RENDER = {json.dumps(render)};
+    </script>
+    {script}{extra_script}
+</body>
+</html>
+"""
+
+
+def write_recipe_box(recipes, output_path, create_link=None, profiler=NULL_PROFILER):
+    """Write recipe-box.html and its index shards for a list of Recipes"""
+    with profiler.stage('index'):
+        index_manifest = write_index(recipes, os.path.join(os.path.dirname(output_path), INDEX_DIR_NAME))
+    return write_box_page(index_manifest, output_path, create_link, profiler)
+
+
+def write_box_page(index_manifest, output_path, create_link=None, profiler=NULL_PROFILER, assets=None):
+    """Write recipe-box.html for an index already written next to it.
+
+    With assets, a static_assets.AssetWriter for the page's directory, the
+    CSS and script go to fingerprinted files, and the page and those files
+    get precompressed copies (the index files are left to the caller).
+    """
+    if create_link is None:
+        create_link = create_link_html()
+    with profiler.stage('box_page'):
+        asset_urls = None
+        if assets is not None:
+            asset_urls = {ext: assets.asset('recipe-box', text, ext) for ext, text in box_assets().items()}
+        content = render_recipe_box(index_manifest, create_link, asset_urls=asset_urls).encode('utf-8')
+        write_if_changed(output_path, content)
+        profiler.count('bytes_written', len(content))
+    if assets is not None:
+        with profiler.stage('compress'):
+            assets.compress([output_path])
+    return output_path
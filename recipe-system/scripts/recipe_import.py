@@ -0,0 +1,367 @@
+"""
+Bulk recipe import from JSON Lines or CSV exports.
+
+Records are streamed from the input one at a time, built into recipe XML
+with lxml and validated against the compiled recipe.xsd. Valid recipes are
+written to the recipes directory in batches: each batch goes to hidden temp
+files first and is then moved into place, so a build or watch running at
+the same time only ever sees complete recipes. Rejected records are
+reported with their line number and reason and are never written.
+
+write_new_recipe() is the same write path for a single new recipe (the web
+form); it picks a free <slug>-N.xml name when the slug is taken.
+
+Fields are the ones of the web form: title, summary, servings, totalTime,
+difficulty, tags, category, ingredients and steps. tags, ingredients and
+steps may be JSON lists; as text (and in CSV) tags are comma-separated and
+ingredients and steps are one per line.
+"""
+import os
+import re
+import csv
+import json
+import time
+import datetime
+import itertools
+import tempfile
+import contextlib
+from lxml import etree
+
+from recipe_metadata import validate_tree
+from recipe_model import FORM_DEFAULTS, LIST_SEPARATORS, NS_URI
+
+NS = NS_URI
+BATCH_SIZE = 500
+FORMATS = ('jsonl', 'csv')
+
+
+def slugify(text):
+    text = text.lower().strip()
+    text = re.sub(r"[^a-z0-9]+", '-', text)
+    text = re.sub(r"-+", '-', text).strip('-')
+    return text or 'recipe'
+
+
+def detect_format(path):
+    """'csv' or 'jsonl' from a file name"""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def iter_records(stream, fmt='jsonl'):
+    """Yield (line number, record dict, error) for each record of a text stream.
+
+    error is None, or a message when the line could not be parsed.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'invalid JSON: {e}'
+            continue
+        if isinstance(record, dict):
+            yield line_number, record, None
+        else:
+            yield line_number, None, 'not a JSON object'
+
+
+def recipe_data(record):
+    """Normalize an imported record to the web form's fields; ValueError if it has no title"""
+    title = str(record.get('title') or '').strip()
+    if not title:
+        raise ValueError('missing title')
+    data = {'title': title}
+    for field, default in FORM_DEFAULTS.items():
+        value = record.get(field)
+        data[field] = str(value).strip() if value not in (None, '') else default
+    for field, separator in LIST_SEPARATORS.items():
+        value = record.get(field) or []
+        if isinstance(value, str):
+            value = value.split(separator)
+        data[field] = [str(item).strip() for item in value if str(item).strip()]
+    return data
+
+
+def build_recipe_tree(data, created=None):
+    """The recipe XML tree for recipe_data() output, in recipe.xsd element order.
+
+    The web form builds its recipes here too. created defaults to now.
+    """
+    if created is None:
+        created = utc_timestamp()
+
+    def sub(parent, tag, text=None):
+        el = etree.SubElement(parent, f'{{{NS}}}{tag}')
+        el.text = text
+        return el
+
+    root = etree.Element(f'{{{NS}}}recipe', nsmap={None: NS})
+    sub(root, 'title', data['title'])
+    description = sub(root, 'description')
+    sub(description, 'summary', data['summary'])
+    if data['tags']:
+        tags = sub(description, 'tags')
+        for tag in data['tags']:
+            sub(tags, 'tag', tag)
+    metadata = sub(root, 'metadata')
+    sub(metadata, 'servings', data['servings'])
+    sub(metadata, 'totalTime', data['totalTime'])
+    sub(metadata, 'difficulty', data['difficulty'])
+    sub(root, 'category', data['category'])
+    ingredients = sub(root, 'ingredients')
+    for ingredient in data['ingredients']:
+        sub(ingredients, 'ingredient', ingredient)
+    preparation = sub(root, 'preparation')
+    for number, step in enumerate(data['steps'], start=1):
+        sub(preparation, 'step', step).set('number', str(number))
+    sub(root, 'created', created)
+    return etree.ElementTree(root)
+
+
+def recipe_xml(tree):
+    """The bytes an imported recipe tree is written to the recipes folder as"""
+    return etree.tostring(tree, xml_declaration=True, encoding='UTF-8', pretty_print=True)
+
+
+# characters XML 1.0 does not allow, which the XML could never be parsed back with
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+NEWLINES = re.compile('\r\n?')
+
+
+def _escape(text):
+    if INVALID_XML_CHARS.search(text):
+        raise ValueError(f'not allowed in XML: {text!r}')
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _text(text):
+    # a parser reads \r\n and lone \r in text content as \n
+    return _escape(NEWLINES.sub('\n', text))
+
+
+def _write_element(out, elem, indent, namespace=None):
+    tag = etree.QName(elem).localname
+    attrs = ''.join(f' {name}="{_escape(value)}"' for name, value in elem.items())
+    if elem.nsmap.get(None) != namespace:
+        attrs = f' xmlns="{_escape(elem.nsmap[None])}"' + attrs
+    namespace = elem.nsmap.get(None)
+    if len(elem) == 0:
+        if elem.text:
+            out.append(f'{indent}<{tag}{attrs}>{_text(elem.text)}</{tag}>\n')
+        else:
+            out.append(f'{indent}<{tag}{attrs}/>\n')
+        return
+    child_indent = indent + '  '
+    out.append(f'{indent}<{tag}{attrs}>\n')
+    if elem.text:
+        out.append(f'{child_indent}{_text(elem.text)}\n')
+    for child in elem:
+        _write_element(out, child, child_indent, namespace)
+        if child.tail:
+            out.append(f'{child_indent}{_text(child.tail)}\n')
+    out.append(f'{indent}</{tag}>\n')
+
+
+def prettify_xml(tree):
+    """Indented UTF-8 XML for a recipe tree (default namespace only), in one pass.
+
+    Used for recipes from the web form. Text-only elements stay on one line
+    and empty ones are self-closed; the bytes are those of the ElementTree ->
+    minidom toprettyxml(indent='  ') round trip the form used to write.
+    """
+    out = ['<?xml version="1.0" encoding="utf-8"?>\n']
+    _write_element(out, tree.getroot(), '')
+    return ''.join(out).encode('utf-8')
+
+
+def utc_timestamp():
+    return datetime.datetime.utcnow().isoformat() + 'Z'
+
+
+class ImportReport:
+    """Outcome of one import: written files, rejected records and throughput"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = []
+        self.rejects = []  # (line number, title, reason)
+        self.seconds = 0.0
+
+    def reject(self, line_number, title, reason):
+        self.rejects.append((line_number, title, reason))
+
+    @property
+    def rate(self):
+        return len(self.imported) / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'imported': len(self.imported),
+            'rejected': [{'line': n, 'title': title, 'reason': reason} for n, title, reason in self.rejects],
+            'seconds': round(self.seconds, 3),
+            'recipesPerSecond': round(self.rate, 1),
+        }
+
+    def summary(self):
+        return (f'Imported {len(self.imported)} of {self.read} record(s), rejected {len(self.rejects)}, '
+                f'in {self.seconds:.2f} s ({self.rate:.0f} recipes/s)')
+
+
+def _write_temp(recipes_dir, filename, content, sync=False):
+    """Write content to a new hidden temp file next to its final name; return its path"""
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', suffix='.tmp', dir=recipes_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _link_new(tmp_path, path):
+    """Put a finished temp file at path unless path exists; return False if it does.
+
+    The file is hard-linked into place. Where the file system has no hard
+    links, path is claimed by creating it exclusively and the temp file is
+    then moved over it, so a reader may briefly see it empty.
+    """
+    try:
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        pass
+    try:
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def _discard(tmp_path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp_path)
+
+
+def publish(tmp_path, path, replace=False):
+    """Move a finished temp file to path.
+
+    Without replace this fails rather than overwrite a file another writer
+    created meanwhile; returns False then and the temp file is dropped.
+    """
+    if replace:
+        os.replace(tmp_path, path)
+        return True
+    try:
+        return _link_new(tmp_path, path)
+    finally:
+        _discard(tmp_path)
+
+
+def write_new_recipe(recipes_dir, slug, content):
+    """Write content as <slug>.xml, or <slug>-2.xml, <slug>-3.xml, ... if taken.
+
+    Safe against concurrent writers in other threads or processes: each
+    candidate name is claimed by an atomic link of the complete, synced
+    file (see _link_new for file systems without links), so no writer
+    overwrites another's recipe and readers never see a partial one.
+    Returns the file name written.
+    """
+    tmp_path = _write_temp(recipes_dir, slug + '.xml', content, sync=True)
+    try:
+        for n in itertools.count(1):
+            filename = f'{slug}.xml' if n == 1 else f'{slug}-{n}.xml'
+            if _link_new(tmp_path, os.path.join(recipes_dir, filename)):
+                return filename
+    finally:
+        _discard(tmp_path)
+
+
+def write_batch(recipes_dir, batch, replace=False):
+    """Write (filename, content) pairs to temp files, then move them all into place.
+
+    Returns the file names that were skipped because, without replace, they
+    were taken by the time the batch was moved into place.
+    """
+    staged = []
+    try:
+        for filename, content in batch:
+            staged.append((_write_temp(recipes_dir, filename, content), filename))
+    except BaseException:
+        for tmp_path, _ in staged:
+            os.remove(tmp_path)
+        raise
+    return [filename for tmp_path, filename in staged
+            if not publish(tmp_path, os.path.join(recipes_dir, filename), replace)]
+
+
+def import_recipes(records, recipes_dir, batch_size=BATCH_SIZE, replace=False):
+    """Validate and write the records from iter_records(); return an ImportReport.
+
+    A record whose file name (the slug of its title) is already taken is
+    rejected unless replace is set; a second record with the same slug in
+    the same import is always rejected.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    with os.scandir(recipes_dir) as it:
+        existing = {entry.name for entry in it if entry.name.endswith('.xml')}
+    seen = set()
+    created = utc_timestamp()
+    batch = []
+    pending = {}  # filename: (line number, title) of the records in batch
+
+    def flush():
+        taken = set(write_batch(recipes_dir, batch, replace))
+        for filename, _ in batch:
+            if filename in taken:
+                report.reject(*pending[filename], f'{filename} already exists')
+            else:
+                report.imported.append(filename)
+        batch.clear()
+        pending.clear()
+
+    for line_number, record, error in records:
+        report.read += 1
+        if error:
+            report.reject(line_number, '', error)
+            continue
+        try:
+            data = recipe_data(record)
+        except ValueError as e:
+            report.reject(line_number, '', str(e))
+            continue
+        filename = slugify(data['title']) + '.xml'
+        if filename in seen:
+            report.reject(line_number, data['title'], f'duplicate of an earlier record ({filename})')
+            continue
+        if filename in existing and not replace:
+            report.reject(line_number, data['title'], f'{filename} already exists')
+            continue
+        tree = build_recipe_tree(data, created)
+        valid, errors = validate_tree(tree)
+        if not valid:
+            report.reject(line_number, data['title'], '; '.join(errors))
+            continue
+        seen.add(filename)
+        pending[filename] = (line_number, data['title'])
+        batch.append((filename, recipe_xml(tree)))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,551 @@
+"""
+Sharded recipe box index.
+
+Instead of inlining every recipe into recipe-box.html, the metadata is written
+as compact shards under web/index/. Records are positional arrays (see
+RECORD_FIELDS) and recipes are numbered 0..n-1 in file name order; shard k
+holds ids [k * shard_size, (k + 1) * shard_size). Validation errors live in
+their own file and are only loaded when the page needs them.
+
+The inverted full-text index (search_index.py) is written alongside as
+search-<key>.js files, one per leading term character, the ingredient
+index (ingredient_index.py) as ingredients.js and the filter facets
+(facet_index.py) as facets.js.
+
+Recipes appended by IndexWriter.apply() after the last full write are not
+in the search files, ingredients.js or facets.js: their shard carries their
+terms, ingredient names and facet keys instead (see appended_entries()),
+from the manifest's appendedFrom id on, so adding a recipe does not rewrite
+files that grow with the collection. Readers merge them in
+(read_ingredients(), the page's loaders).
+
+Each file wraps its JSON payload in a RecipeIndex.<callback>(...) call so the
+page can load it with a <script> tag, which also works from file:// URLs
+where fetch() of local files is blocked.
+"""
+import os
+import json
+import bisect
+import hashlib
+from array import array
+
+from facet_index import FACETS_FILE, encode_ids, facet_payload, recipe_facets
+from ingredient_index import INGREDIENTS_FILE, ingredient_payload
+from recipe_model import Recipe
+from search_index import SEARCH_PREFIX, STOPWORDS, build_postings, delta_encode, shard_key
+from static_assets import COMPRESSED_SUFFIXES
+
+INDEX_DIR_NAME = 'index'
+SHARD_SIZE = 500
+SHARD_PREFIX = 'recipes-'
+VALIDATION_FILE = 'validation.js'
+RECORD_FIELDS = ['id', 'title', 'description', 'servings', 'totalTime',
+                 'totalTimeDisplay', 'difficulty', 'tags', 'category', 'valid',
+                 'ingredientCount', 'stepCount']
+
+
+def compact_record(recipe):
+    """Return the positional record for one Recipe"""
+    return [recipe.id, recipe.title, recipe.description, recipe.servings, recipe.totalTime,
+            recipe.totalTimeDisplay, recipe.difficulty, recipe.tags, recipe.category, 1 if recipe.valid else 0,
+            recipe.ingredientCount, recipe.stepCount]
+
+
+def index_file_content(callback, *args):
+    """The bytes of a RecipeIndex.<callback>(args...) index file"""
+    payload = ','.join(json.dumps(arg, separators=(',', ':'), ensure_ascii=False) for arg in args)
+    return f'RecipeIndex.{callback}({payload});\n'.encode('utf-8')
+
+
+def write_index_file(path, callback, *args):
+    """Write RecipeIndex.<callback>(args...) to path; skip if unchanged.
+
+    Returns True if the file was (re)written.
+    """
+    return write_if_changed(path, index_file_content(callback, *args))
+
+
+def write_if_changed(path, content):
+    """Atomically replace path with content bytes unless it already holds them"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def read_index_file(path):
+    """Return the argument list of a RecipeIndex.<callback>(...) file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return json.loads('[' + content[content.index('(') + 1:content.rindex(')')] + ']')
+
+
+def read_records(index_dir, ids, shard_size=SHARD_SIZE):
+    """Return {id: record dict} for integer recipe ids, reading each shard once"""
+    records = {}
+    shards = {}
+    for recipe_id in ids:
+        n = recipe_id // shard_size
+        if n not in shards:
+            shards[n] = read_index_file(os.path.join(index_dir, f'{SHARD_PREFIX}{n:04d}.js'))[1]
+        records[recipe_id] = dict(zip(RECORD_FIELDS, shards[n][recipe_id % shard_size]))
+    return records
+
+
+def write_index(recipes, index_dir, shard_size=SHARD_SIZE):
+    """Write every index file for an iterable of recipes; return the index manifest.
+
+    The recipes are consumed one at a time (see IndexStream), so a generator
+    keeps memory bounded by the postings rather than by the metadata.
+    """
+    stream = IndexStream(index_dir, shard_size)
+    for recipe in recipes:
+        stream.add(recipe)
+    return stream.close()
+
+
+def index_manifest(shards, count, invalid, search_keys, shard_size=SHARD_SIZE, appended_from=None):
+    """The index description embedded in recipe-box.html"""
+    return {
+        'version': 1,
+        'base': INDEX_DIR_NAME + '/',
+        'count': count,
+        'appendedFrom': count if appended_from is None else appended_from,
+        'fields': RECORD_FIELDS,
+        'shardSize': shard_size,
+        'shards': shards,
+        'validation': VALIDATION_FILE,
+        'invalid': invalid,
+        'search': {
+            'prefix': SEARCH_PREFIX,
+            'keys': sorted(search_keys),
+            'stopwords': sorted(STOPWORDS),
+        },
+        'ingredients': INGREDIENTS_FILE,
+        'facets': FACETS_FILE,
+    }
+
+
+def appended_entries(first, recipes):
+    """Shard payload of recipes appended from id `first` on: their terms, ingredient names and facet keys"""
+    return {
+        'first': first,
+        'terms': [list(recipe.terms) for recipe in recipes],
+        'ingredients': [recipe.ingredients for recipe in recipes],
+        'facets': [recipe_facets(recipe) for recipe in recipes],
+    }
+
+
+def read_ingredients(index_dir, shard_size=SHARD_SIZE):
+    """Return the ingredients.js payload with the entries of appended recipes merged in"""
+    payload, = read_index_file(os.path.join(index_dir, INGREDIENTS_FILE))
+    totals = payload['totals']
+    postings = dict(zip(payload['names'], payload['postings']))
+    last = {}  # name -> last recipe id of its posting list
+    n = len(totals) // shard_size
+    while os.path.exists(os.path.join(index_dir, f'{SHARD_PREFIX}{n:04d}.js')):
+        args = read_index_file(os.path.join(index_dir, f'{SHARD_PREFIX}{n:04d}.js'))
+        n += 1
+        if len(args) < 3:
+            continue
+        appended = args[2]
+        for recipe_id, names in enumerate(appended['ingredients'], appended['first']):
+            for name in names:
+                deltas = postings.setdefault(name, [])
+                deltas.append(recipe_id - last.get(name, sum(deltas)))
+                last[name] = recipe_id
+            totals.append(len(names))
+    payload['names'] = sorted(postings)
+    payload['postings'] = [postings[name] for name in payload['names']]
+    return payload
+
+
+def _prune(index_dir, written):
+    """Remove shards left over from a larger collection, with their compressed copies"""
+    for filename in os.listdir(index_dir):
+        base, suffix = os.path.splitext(filename)
+        shard = base if suffix in COMPRESSED_SUFFIXES else filename
+        if filename.startswith((SHARD_PREFIX, SEARCH_PREFIX)) and shard not in written:
+            os.remove(os.path.join(index_dir, filename))
+
+
+class IndexStream:
+    """Writes the index from recipes arriving one at a time, in id order.
+
+    A record shard is written as soon as it is full and the Recipes are not
+    kept: only the validation errors of invalid recipes and the posting
+    lists (as compact arrays) stay in memory until close() writes the search
+    and ingredient files. The files are the same as IndexWriter.write() makes.
+    """
+
+    def __init__(self, index_dir, shard_size=SHARD_SIZE):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.shard_size = shard_size
+        self.count = 0
+        self.chunk = []
+        self.shards = []
+        self.written = set()
+        self.validation = {}
+        self.term_postings = {}
+        self.ingredient_postings = {}
+        self.ingredient_totals = []
+        self.facet_postings = {}
+
+    def add(self, recipe):
+        recipe_id = self.count
+        self.count += 1
+        self.chunk.append(compact_record(recipe))
+        if not recipe.valid:
+            self.validation[recipe.id] = recipe.validationErrors
+        for postings, keys in ((self.term_postings, recipe.terms), (self.ingredient_postings, recipe.ingredients),
+                               (self.facet_postings, recipe_facets(recipe))):
+            for key in keys:
+                ids = postings.get(key)
+                if ids is None:
+                    ids = postings[key] = array('I')
+                ids.append(recipe_id)
+        self.ingredient_totals.append(len(recipe.ingredients))
+        if len(self.chunk) == 1:
+            self.shards.append({'file': f'{SHARD_PREFIX}{len(self.shards):04d}.js', 'first': recipe.id, 'count': 0})
+        self.shards[-1]['count'] += 1
+        if len(self.chunk) == self.shard_size:
+            self._write_shard()
+
+    def _write(self, filename, callback, *args):
+        write_index_file(os.path.join(self.index_dir, filename), callback, *args)
+        self.written.add(filename)
+
+    def _write_shard(self):
+        self._write(self.shards[-1]['file'], 'addShard', len(self.shards) - 1, self.chunk)
+        self.chunk = []
+
+    def close(self):
+        """Write the remaining files and remove stale ones; return the index manifest"""
+        if self.chunk:
+            self._write_shard()
+        self._write(VALIDATION_FILE, 'addValidation', self.validation)
+
+        search_terms = {}
+        for term in self.term_postings:
+            search_terms.setdefault(shard_key(term), []).append(term)
+        for key, terms in search_terms.items():
+            terms.sort()
+            postings = [delta_encode(self.term_postings.pop(term)) for term in terms]
+            self._write(f'{SEARCH_PREFIX}{key}.js', 'addTerms', key, terms, postings)
+
+        encoded = {name: delta_encode(ids) for name, ids in self.ingredient_postings.items()}
+        self.ingredient_postings = {}
+        write_index_file(os.path.join(self.index_dir, INGREDIENTS_FILE), 'addIngredients',
+                         ingredient_payload(encoded, self.ingredient_totals))
+        write_index_file(os.path.join(self.index_dir, FACETS_FILE), 'addFacets',
+                         facet_payload(self.facet_postings, self.count))
+        _prune(self.index_dir, self.written)
+        return index_manifest(self.shards, self.count, len(self.validation), search_terms, self.shard_size)
+
+
+class IndexWriter:
+    """Writes the index and keeps its postings in memory for incremental updates.
+
+    write() lays out the whole index in the given order. update() replaces
+    one recipe in place (same id, e.g. an edited file) and append() adds one
+    as the next id; apply() does either for a batch. They rewrite only the
+    files the recipes touch: their record shards, validation.js if a validity
+    changed, and for recipes indexed by write(), the search shards of terms
+    gained or lost, ingredients.js if ingredients changed and facets.js if a
+    facet value changed. Appended recipes stay at the end, with their terms,
+    ingredients and facets in their shard, until the next write(). Removing a
+    recipe renumbers the ids after it, so that goes through write() again.
+    A writer that has not written yet starts a new, empty index on its first
+    apply(). Files are replaced atomically, so a page loading the index while it is
+    updated sees either the old or the new version of each file.
+    """
+
+    def __init__(self, index_dir, shard_size=SHARD_SIZE):
+        self.index_dir = index_dir
+        self.shard_size = shard_size
+        self.recipes = None  # None until the first write()
+        self.appended_from = 0
+        self.positions = {}
+        self.invalid = set()
+        self.written = set()  # files rewritten or removed since take_changes()
+
+    def _path(self, filename):
+        return os.path.join(self.index_dir, filename)
+
+    def _emit(self, filename, content):
+        if write_if_changed(self._path(filename), content):
+            self.written.add(filename)
+
+    def _remove(self, filename):
+        for suffix in ('',) + COMPRESSED_SUFFIXES:
+            if os.path.exists(self._path(filename) + suffix):
+                os.remove(self._path(filename) + suffix)
+        self.written.add(filename)
+
+    def take_changes(self):
+        """Return the paths of the files rewritten or removed since the last call"""
+        changed = sorted(self._path(filename) for filename in self.written)
+        self.written = set()
+        return changed
+
+    def _prune(self, written):
+        _prune(self.index_dir, written)
+
+    def write(self, recipes):
+        """Write every index file for recipes; return the index manifest"""
+        if self.index_dir is not None:
+            os.makedirs(self.index_dir, exist_ok=True)
+        self.recipes = list(recipes)
+        self.appended_from = len(self.recipes)
+        self.positions = {r.id: n for n, r in enumerate(self.recipes)}
+        self.invalid = {r.id for r in self.recipes if not r.valid}
+        written = set()
+        for n in range(0, len(self.recipes), self.shard_size):
+            written.add(self._write_shard(n // self.shard_size))
+        written.add(self._write_validation())
+
+        # delta-encoded copies of the posting lists, re-encoded only when a list changes
+        self.term_postings = build_postings(r.terms for r in self.recipes)
+        self.term_deltas = {term: delta_encode(ids) for term, ids in self.term_postings.items()}
+        self.term_json = {}
+        self.search_terms = {}
+        for term in self.term_postings:
+            self.search_terms.setdefault(shard_key(term), set()).add(term)
+        for key in self.search_terms:
+            written.add(self._write_search(key))
+
+        self.ingredient_postings = build_postings(r.ingredients for r in self.recipes)
+        self.ingredient_deltas = {name: delta_encode(ids) for name, ids in self.ingredient_postings.items()}
+        self.ingredient_json = {}
+        self.ingredient_totals = [len(r.ingredients) for r in self.recipes]
+        self._write_ingredients()
+
+        # encoded id sets of the facet values, re-encoded only when a set changes
+        self.facet_postings = build_postings(recipe_facets(r) for r in self.recipes)
+        self.facet_json = {}
+        self._write_facets()
+        self._prune(written)
+        return self.manifest()
+
+    def update(self, recipe):
+        """Replace the recipe with the same id; return the index manifest"""
+        if recipe.id not in self.positions:
+            raise KeyError(recipe.id)
+        return self.apply([recipe])
+
+    def append(self, recipe):
+        """Add a recipe as the highest id; return the index manifest"""
+        return self.apply([recipe])
+
+    def apply(self, recipes):
+        """Update recipes already indexed and append the others, in order.
+
+        Each touched file is rewritten once for the whole batch. Appended
+        recipes take their terms, ingredient names and facet keys into their
+        own shard, leaving the search files, ingredients.js and facets.js to
+        the next write().
+        Returns the index manifest.
+        """
+        if self.recipes is None:
+            self.write([])
+        shards = set()
+        touched = set()
+        validation = ingredients = facets = False
+        for recipe in recipes:
+            recipe_id = self.positions.get(recipe.id)
+            if recipe_id is None:
+                recipe_id = self.positions[recipe.id] = len(self.recipes)
+                self.recipes.append(recipe)
+                old = _EMPTY
+            else:
+                old = self.recipes[recipe_id]
+                self.recipes[recipe_id] = recipe
+            shards.add(recipe_id // self.shard_size)
+
+            if (old.valid, old.validationErrors) != (recipe.valid, recipe.validationErrors):
+                if recipe.valid:
+                    self.invalid.discard(recipe.id)
+                else:
+                    self.invalid.add(recipe.id)
+                validation = True
+
+            if recipe_id >= self.appended_from:
+                continue  # its shard carries its terms, ingredients and facets
+
+            for term in _move(self.term_postings, self.term_deltas, recipe_id, old.terms, recipe.terms):
+                self.term_json.pop(term, None)
+                key = shard_key(term)
+                touched.add(key)
+                if term in self.term_postings:
+                    self.search_terms.setdefault(key, set()).add(term)
+                else:
+                    self.search_terms[key].discard(term)
+
+            if old.ingredients != recipe.ingredients:
+                for name in _move(self.ingredient_postings, self.ingredient_deltas, recipe_id,
+                                  old.ingredients, recipe.ingredients):
+                    self.ingredient_json.pop(name, None)
+                self.ingredient_totals[recipe_id] = len(recipe.ingredients)
+                ingredients = True
+
+            for key in _move(self.facet_postings, None, recipe_id, recipe_facets(old), recipe_facets(recipe)):
+                self.facet_json.pop(key, None)
+                facets = True
+
+        for n in sorted(shards):
+            self._write_shard(n)
+        if validation:
+            self._write_validation()
+        for key in sorted(touched):
+            if self.search_terms[key]:
+                self._write_search(key)
+            else:
+                del self.search_terms[key]
+                self._remove(f'{SEARCH_PREFIX}{key}.js')
+        if ingredients:
+            self._write_ingredients()
+        if facets:
+            self._write_facets()
+        return self.manifest()
+
+    def _write_shard(self, n):
+        filename = f'{SHARD_PREFIX}{n:04d}.js'
+        start = n * self.shard_size
+        chunk = self.recipes[start:start + self.shard_size]
+        args = [n, [compact_record(r) for r in chunk]]
+        first = max(start, self.appended_from)
+        if first < start + len(chunk):
+            args.append(appended_entries(first, chunk[first - start:]))
+        self._emit(filename, index_file_content('addShard', *args))
+        return filename
+
+    def _validation(self):
+        ids = sorted(self.invalid, key=self.positions.__getitem__)
+        return {i: self.recipes[self.positions[i]].validationErrors for i in ids}
+
+    def _write_validation(self):
+        self._emit(VALIDATION_FILE, index_file_content('addValidation', self._validation()))
+        return VALIDATION_FILE
+
+    def _write_search(self, key):
+        filename = f'{SEARCH_PREFIX}{key}.js'
+        terms = sorted(self.search_terms[key])
+        content = index_file_content('addTerms', key, terms, _SPLICE)
+        self._emit(filename, _splice(content, self._fragments(self.term_json, self.term_deltas, terms)))
+        return filename
+
+    def _write_ingredients(self):
+        payload = ingredient_payload(dict.fromkeys(self.ingredient_deltas, ()), self.ingredient_totals)
+        payload['postings'] = _SPLICE
+        content = index_file_content('addIngredients', payload)
+        fragments = self._fragments(self.ingredient_json, self.ingredient_deltas, payload['names'])
+        self._emit(INGREDIENTS_FILE, _splice(content, fragments))
+
+    def _write_facets(self):
+        fragments = []
+
+        def encode(keys):
+            for key in keys:
+                if key not in self.facet_json:
+                    self.facet_json[key] = json.dumps(encode_ids(self.facet_postings[key]), separators=(',', ':'))
+            fragments.append([self.facet_json[key] for key in keys])
+            return _SPLICE
+
+        content = index_file_content('addFacets', facet_payload(self.facet_postings, self.appended_from, encode))
+        for facet_fragments in fragments:
+            content = _splice(content, facet_fragments)
+        self._emit(FACETS_FILE, content)
+
+    @staticmethod
+    def _fragments(cache, deltas, keys):
+        """JSON text of each key's delta list; encoded once per change of the list"""
+        fragments = []
+        for key in keys:
+            text = cache.get(key)
+            if text is None:
+                text = cache[key] = json.dumps(deltas[key], separators=(',', ':'))
+            fragments.append(text)
+        return fragments
+
+    def manifest(self):
+        """The index description embedded in recipe-box.html"""
+        count = len(self.recipes)
+        shards = [{'file': f'{SHARD_PREFIX}{n:04d}.js', 'first': self.recipes[start].id,
+                   'count': min(self.shard_size, count - start)}
+                  for n, start in enumerate(range(0, count, self.shard_size))]
+        return index_manifest(shards, count, len(self.invalid), self.search_terms, self.shard_size,
+                              self.appended_from)
+
+
+class MemoryIndex(IndexWriter):
+    """IndexWriter that keeps the index files in memory, for serving them directly.
+
+    files maps each file name to (content bytes, etag).
+    """
+
+    def __init__(self, shard_size=SHARD_SIZE):
+        super().__init__(None, shard_size)
+        self.files = {}
+
+    def _emit(self, filename, content):
+        previous = self.files.get(filename)
+        if previous is None or previous[0] != content:
+            self.files[filename] = (content, hashlib.sha256(content).hexdigest()[:20])
+
+    def _remove(self, filename):
+        self.files.pop(filename, None)
+
+    def _prune(self, written):
+        for filename in list(self.files):
+            if filename.startswith((SHARD_PREFIX, SEARCH_PREFIX)) and filename not in written:
+                del self.files[filename]
+
+# what an appended recipe replaces in apply(): nothing indexed
+_EMPTY = Recipe(title='', description='', servings=0, totalTime=0, totalTimeDisplay='', difficulty='',
+                tags=(), category='')
+
+# Placeholder for a list of pre-encoded JSON fragments; tokens never contain NUL
+_SPLICE = '\0fragments\0'
+_SPLICE_JSON = json.dumps(_SPLICE).encode('utf-8')
+
+
+def _splice(content, fragments):
+    """Replace the _SPLICE placeholder in index file content with the fragment list"""
+    return content.replace(_SPLICE_JSON, ('[' + ','.join(fragments) + ']').encode('utf-8'), 1)
+
+
+def _move(postings, deltas, recipe_id, old_keys, new_keys):
+    """Move recipe_id between posting lists; return the keys whose lists changed.
+
+    deltas, the delta-encoded copies of the lists, are kept in step unless None.
+    """
+    old_keys, new_keys = set(old_keys), set(new_keys)
+    for key in old_keys - new_keys:
+        ids = postings[key]
+        del ids[bisect.bisect_left(ids, recipe_id)]
+        if not ids:
+            del postings[key]
+            if deltas is not None:
+                del deltas[key]
+        elif deltas is not None:
+            deltas[key] = delta_encode(ids)
+    for key in new_keys - old_keys:
+        ids = postings.setdefault(key, [])
+        if not ids or ids[-1] < recipe_id:
+            # appending the highest id only extends the delta list
+            if deltas is not None:
+                deltas.setdefault(key, []).append(recipe_id - (ids[-1] if ids else 0))
+            ids.append(recipe_id)
+        else:
+            bisect.insort(ids, recipe_id)
+            if deltas is not None:
+                deltas[key] = delta_encode(ids)
+    return old_keys ^ new_keys
@@ -0,0 +1,143 @@
+"""
+Recipe metadata extraction and XSD validation for the recipe box.
+
+Works on an already parsed lxml tree so a build can parse each recipe once
+and share the tree between validation, metadata extraction and rendering.
+extract_metadata() returns a recipe_model.Recipe.
+"""
+import os
+from lxml import etree
+
+from build_manifest import file_hash
+from ingredient_index import recipe_ingredients
+from recipe_model import NS_URI, Recipe
+from recipe_time import format_minutes, parse_time_to_minutes, total_minutes
+from search_index import recipe_terms
+
+NS = {'r': NS_URI}
+# Clark-notation tags of the elements extract_metadata() reads
+(_TITLE, _DESCRIPTION, _SUMMARY, _TAGS, _TAG, _METADATA, _SERVINGS, _PREP_TIME, _COOK_TIME, _TOTAL_TIME,
+ _DIFFICULTY, _CATEGORY, _INGREDIENTS, _INGREDIENT, _PREPARATION, _STEP) = (
+    f'{{{NS_URI}}}{name}' for name in ('title', 'description', 'summary', 'tags', 'tag', 'metadata', 'servings',
+                                      'prepTime', 'cookTime', 'totalTime', 'difficulty', 'category',
+                                      'ingredients', 'ingredient', 'preparation', 'step'))
+# Bump when extract_metadata()'s result changes (shape or normalization) so caches rebuild
+METADATA_VERSION = 8
+SCHEMA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'schemas', 'recipe.xsd'))
+
+SCHEMA = None
+
+
+def compile_schema(path=SCHEMA_PATH):
+    """Compile an XSD, or return None if it is missing or broken"""
+    try:
+        return etree.XMLSchema(etree.parse(path))
+    except Exception:
+        return None
+
+
+def load_schema():
+    """(Re)load the XSD used for validation; a broken schema disables validation"""
+    global SCHEMA
+    SCHEMA = compile_schema()
+    return SCHEMA
+
+
+# Load XSD schema for validation
+load_schema()
+
+
+def metadata_cache_key():
+    """Key that invalidates cached metadata when the schema or format changes"""
+    schema_hash = file_hash(SCHEMA_PATH) if SCHEMA is not None else ''
+    return f'{METADATA_VERSION}:{schema_hash}'
+
+
+def validate_tree(tree, schema=None):
+    """Validate a parsed recipe against the XSD (default: SCHEMA); return (valid, errors)
+
+    The errors come with the exception rather than from the schema's shared
+    error_log, so one compiled schema never reports another call's errors.
+    """
+    schema = SCHEMA if schema is None else schema
+    if schema is None:
+        return True, []
+    try:
+        schema.assertValid(tree)
+        return True, []
+    except etree.DocumentInvalid as e:
+        return False, [str(err) for err in e.error_log]
+    except Exception as e:
+        return False, [str(e)]
+
+
+def _text(elem, default):
+    return (elem.text or '') if elem is not None else default
+
+
+def extract_metadata(tree, validate=True):
+    """Extract the recipe box metadata (a Recipe) from a parsed recipe tree
+
+    Reads the fields in one pass over the root's children, at the places
+    recipe.xsd puts them, so an element of the same name nested elsewhere
+    is never mistaken for one of them. With validate=False the XSD check is skipped and
+    the recipe is reported valid (used when validation is timed or run
+    separately).
+    """
+    title = summary = servings = prep_time = cook_time = total_time = difficulty = category = None
+    tags, ingredients, steps = [], [], []
+    for child in tree.getroot():
+        tag = child.tag
+        if tag == _INGREDIENTS:
+            ingredients.extend(i.text for i in child if i.tag == _INGREDIENT and i.text)
+        elif tag == _PREPARATION:
+            steps.extend(step.text for step in child if step.tag == _STEP and step.text)
+        elif tag == _DESCRIPTION:
+            for elem in child:
+                if elem.tag == _SUMMARY and summary is None:
+                    summary = elem
+                elif elem.tag == _TAGS:
+                    tags.extend(t.text for t in elem if t.tag == _TAG and t.text)
+        elif tag == _METADATA:
+            for elem in child:
+                if elem.tag == _SERVINGS and servings is None:
+                    servings = elem
+                elif elem.tag == _TOTAL_TIME and total_time is None:
+                    total_time = elem
+                elif elem.tag == _PREP_TIME and prep_time is None:
+                    prep_time = elem
+                elif elem.tag == _COOK_TIME and cook_time is None:
+                    cook_time = elem
+                elif elem.tag == _DIFFICULTY and difficulty is None:
+                    difficulty = elem
+        elif tag == _TITLE and title is None:
+            title = child
+        elif tag == _CATEGORY and category is None:
+            category = child
+
+    title = _text(title, 'Unknown Recipe')
+    summary = _text(summary, '')
+    servings = _text(servings, '4')
+    # without a (readable) totalTime the recipe takes prepTime + cookTime
+    total_time = _text(total_time, '0 minutes')
+    minutes = total_minutes(_text(prep_time, ''), _text(cook_time, ''), total_time)
+    if minutes != parse_time_to_minutes(total_time):
+        total_time = format_minutes(minutes)
+    valid, validation_errors = validate_tree(tree) if validate else (True, [])
+    return Recipe(
+        title=title,
+        description=summary,
+        servings=int(servings) if servings.isdigit() else 4,
+        totalTime=minutes,
+        totalTimeDisplay=total_time,
+        difficulty=_text(difficulty, 'medium'),
+        tags=tags,
+        category=_text(category, 'uncategorized'),
+        valid=valid,
+        validationErrors=validation_errors,
+        # full-text search terms over title, summary, tags, ingredients and steps
+        terms=recipe_terms(title, summary, *tags, *ingredients, *steps),
+        ingredients=recipe_ingredients(ingredients),
+        ingredientCount=len(ingredients),
+        stepCount=len(steps),
+    )
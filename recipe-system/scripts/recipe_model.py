@@ -0,0 +1,80 @@
+"""
+Recipe model shared by the build scripts, the recipe box index, the web form
+and the importer.
+
+Recipe is the recipe box record of one recipe file. Watch mode and the web
+server keep one per recipe in memory, so it uses __slots__ and interns the
+strings that repeat across a collection (tags, category, difficulty, search
+terms and ingredient names): each distinct value is stored once no matter
+how many recipes use it. Sequences are tuples.
+
+FORM_DEFAULTS are the values a new recipe gets for fields the web form or an
+import leaves empty.
+"""
+import sys
+
+NS_URI = 'http://www.example.com/recipe'
+FORM_DEFAULTS = {'summary': '', 'servings': '4', 'totalTime': '', 'difficulty': 'medium', 'category': 'uncategorized'}
+# list fields of a new recipe and how they are split when given as one text
+LIST_SEPARATORS = {'tags': ',', 'ingredients': '\n', 'steps': '\n'}
+
+_intern = sys.intern
+
+
+class Recipe:
+    """Recipe box metadata of one recipe: what extract_metadata() returns.
+
+    id (the file name without .xml) is set once the recipe's file is known.
+    ingredients are the normalized base names (ingredient_index.py);
+    ingredientCount and stepCount count the recipe's lines.
+    Field names are those of the index records (recipe_index.RECORD_FIELDS)
+    and of the metadata cache rows.
+    """
+
+    __slots__ = ('id', 'title', 'description', 'servings', 'totalTime', 'totalTimeDisplay', 'difficulty',
+                 'tags', 'category', 'valid', 'validationErrors', 'terms', 'ingredients', 'ingredientCount',
+                 'stepCount')
+    # every field but id, in the order of as_dict()
+    FIELDS = __slots__[1:]
+
+    def __init__(self, title, description, servings, totalTime, totalTimeDisplay, difficulty, tags, category,
+                 valid=True, validationErrors=(), terms=(), ingredients=(), ingredientCount=0, stepCount=0, id=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.servings = servings
+        self.totalTime = totalTime
+        self.totalTimeDisplay = _intern(totalTimeDisplay)
+        self.difficulty = _intern(difficulty)
+        self.tags = tuple(map(_intern, tags))
+        self.category = _intern(category)
+        self.valid = valid
+        self.validationErrors = tuple(validationErrors)
+        self.terms = tuple(map(_intern, terms))
+        self.ingredients = tuple(map(_intern, ingredients))
+        self.ingredientCount = ingredientCount
+        self.stepCount = stepCount
+
+    @property
+    def path(self):
+        """The recipe's page, relative to the web directory"""
+        return f'recipes/{self.id}.html'
+
+    def set_validation(self, valid, errors):
+        self.valid = valid
+        self.validationErrors = tuple(errors)
+
+    def as_dict(self):
+        """The fields but id as a JSON-ready dict (the metadata cache row)"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __reduce__(self):
+        # through __init__, so a Recipe sent back from a build worker is interned here
+        return Recipe, (*(getattr(self, field) for field in self.FIELDS), self.id)
+
+    def __repr__(self):
+        return f'Recipe(id={self.id!r}, title={self.title!r})'
@@ -0,0 +1,198 @@
+"""
+Recipe pages and the recipe box rendered on demand from the recipe XML.
+
+RecipeSite is the Flask-free core of the dynamic site served by
+recipe-web-generator.py --serve. Rendered pages are kept in an LRU cache
+keyed by the recipe's content hash and the stylesheet version, so an edited
+recipe or stylesheet is picked up on the next request without any explicit
+invalidation; file hashes are only recomputed when a file's stat changes.
+Every response carries an ETag and Last-Modified so clients can revalidate
+with a 304.
+
+The recipe box and its index files are built in memory (MemoryIndex) from
+one scan of the recipes directory. Requests never rescan it: whoever writes
+or watches recipes reports the changed files with record(), or asks for a
+full rescan with refresh().
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+import functools
+from collections import namedtuple
+from lxml import etree
+
+from build_manifest import fingerprint
+from recipe_box import create_button_html, render_recipe_box
+from recipe_index import MemoryIndex
+from recipe_metadata import extract_metadata
+from recipe_renderer import DEFAULT_XSL, RecipeRenderer
+from site_build import RECIPES_DIR, iter_recipe_files
+
+PAGE_CACHE_SIZE = 2048
+SLUG_RE = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]*')
+
+# body is bytes, last_modified is a POSIX timestamp
+Page = namedtuple('Page', 'body etag last_modified')
+
+
+class RecipeSite:
+    """Render recipe pages, the recipe box and its index on request"""
+
+    def __init__(self, recipes_dir=RECIPES_DIR, xsl_path=DEFAULT_XSL, cache_size=PAGE_CACHE_SIZE):
+        self.recipes_dir = recipes_dir
+        self.renderer = RecipeRenderer(xsl_path)
+        self._renderers = []  # idle renderers, each with its own compiled transform
+        self._renderers_lock = threading.Lock()
+        self._stamps = {}
+        self._render_cached = functools.lru_cache(maxsize=cache_size)(self._render)
+
+        self.index = MemoryIndex()
+        self.create_link = create_button_html('/')
+        self._box_lock = threading.Lock()
+        self._box = None
+        self._metadata = {}
+
+    def _fingerprint(self, path):
+        entry = fingerprint(path, self._stamps.get(path))
+        self._stamps[path] = entry
+        return entry
+
+    def _render(self, xml_path, sha256, version):
+        # concurrent misses each take an idle renderer, compiling another only
+        # when all are busy, so no render waits for another to finish
+        with self._renderers_lock:
+            renderer = self._renderers.pop() if self._renderers else RecipeRenderer(self.renderer.xsl_path)
+        try:
+            html_content = renderer.render_file(xml_path)
+        finally:
+            with self._renderers_lock:
+                self._renderers.append(renderer)
+        return html_content.encode('utf-8')
+
+    def recipe_path(self, slug):
+        """Recipe XML path for a page slug, or None if there is no such recipe"""
+        if not SLUG_RE.fullmatch(slug):
+            return None
+        xml_path = os.path.join(self.recipes_dir, slug + '.xml')
+        return xml_path if os.path.isfile(xml_path) else None
+
+    def page(self, slug):
+        """The rendered Page for a recipe slug, or None"""
+        xml_path = self.recipe_path(slug)
+        if xml_path is None:
+            return None
+        try:
+            entry = self._fingerprint(xml_path)
+        except FileNotFoundError:
+            return None
+        version = self.renderer.version
+        body = self._render_cached(xml_path, entry['sha256'], version)
+        last_modified = max(entry['mtime_ns'] / 1e9, self.renderer.last_modified)
+        return Page(body, f'{entry["sha256"][:20]}-{version}', last_modified)
+
+    def cache_info(self):
+        return self._render_cached.cache_info()
+
+    def box(self):
+        """The recipe box Page; the recipes directory is scanned on first use only"""
+        with self._box_lock:
+            if self._box is None:
+                self._scan()
+            return self._box
+
+    def refresh(self):
+        """Rescan the recipes directory, e.g. after a watcher lost events"""
+        with self._box_lock:
+            self._scan()
+
+    def index_file(self, filename):
+        """(content, etag) of a recipe box index file, or None"""
+        self.box()
+        return self.index.files.get(filename)
+
+    def _scan(self):
+        changed = []
+        recipes = []
+        for filename in iter_recipe_files(self.recipes_dir):
+            xml_path = os.path.join(self.recipes_dir, filename)
+            try:
+                entry = self._fingerprint(xml_path)
+            except FileNotFoundError:
+                continue
+            cached = self._metadata.get(filename)
+            if cached is None or cached[0] != entry['sha256']:
+                try:
+                    metadata = extract_metadata(etree.parse(xml_path))
+                except Exception as e:
+                    print(f'Error parsing {xml_path}: {e}')
+                    self._metadata.pop(filename, None)
+                    continue
+                metadata.id = os.path.splitext(filename)[0]
+                cached = self._metadata[filename] = (entry['sha256'], metadata)
+                changed.append(metadata)
+            recipes.append(cached[1])
+
+        # recipes added by record() sit at the end of the index, not in file order
+        positions = self.index.positions if self.index.recipes is not None else None
+        if positions is not None and len(positions) == len(recipes) and all(r.id in positions for r in recipes):
+            if not changed:
+                return
+            for metadata in changed:
+                self.index.update(metadata)
+            index_manifest = self.index.manifest()
+        else:
+            index_manifest = self.index.write(recipes)
+            live = {r.id for r in recipes}
+            for filename in [f for f in self._metadata if os.path.splitext(f)[0] not in live]:
+                del self._metadata[filename]
+        self._render_box(index_manifest)
+
+    def _render_box(self, index_manifest):
+        body = render_recipe_box(index_manifest, self.create_link).encode('utf-8')
+        if self._box is None or self._box.body != body:
+            self._box = Page(body, hashlib.sha256(body).hexdigest()[:20], time.time())
+
+    def record(self, recipes):
+        """Add, update or drop recipes in the box from already extracted metadata.
+
+        recipes are (filename, metadata) pairs, with metadata None for a
+        recipe that was deleted or failed to build. Recipes whose content
+        is unchanged since they were last recorded are skipped.
+        """
+        with self._box_lock:
+            if self.index.recipes is None:
+                return  # the first box() request scans everything anyway
+            changed = []
+            dropped = False
+            for filename, metadata in recipes:
+                xml_path = os.path.join(self.recipes_dir, filename)
+                try:
+                    entry = self._fingerprint(xml_path) if metadata is not None else None
+                except FileNotFoundError:
+                    entry = None
+                if entry is None:
+                    self._stamps.pop(xml_path, None)
+                    dropped = self._metadata.pop(filename, None) is not None or dropped
+                    continue
+                cached = self._metadata.get(filename)
+                if cached is not None and cached[0] == entry['sha256']:
+                    continue
+                self._metadata[filename] = (entry['sha256'], metadata)
+                changed.append(metadata)
+            if dropped:
+                # the index has no removal in place; rewrite it in file order
+                self._render_box(self.index.write([self._metadata[f][1] for f in sorted(self._metadata)]))
+            elif changed:
+                self._render_box(self.index.apply(changed))
+
+    def prewarm(self):
+        """Render the recipe box and every recipe page into the cache"""
+        start = time.perf_counter()
+        self.box()
+        count = 0
+        for filename in iter_recipe_files(self.recipes_dir):
+            if self.page(os.path.splitext(filename)[0]) is not None:
+                count += 1
+        return count, time.perf_counter() - start
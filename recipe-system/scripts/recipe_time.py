@@ -0,0 +1,135 @@
+"""
+Recipe duration parsing: "1 hour 45 minutes" -> 105.
+
+Understands the ways recipe times are written in practice:
+
+  "45 minutes", "45 min", "45m", "45"       -> 45
+  "1 hr 30 min", "1h30", "1:30", "1.5 hours" -> 90
+  "1,5 hours" (decimal comma before a unit)  -> 90
+  "1 1/2 hours", "an hour", "half an hour"   -> 90, 60, 30
+  "20-30 minutes", "1 to 2 hours"            -> 30, 120 (the longer end)
+  "PT1H30M", "P1DT2H" (ISO 8601)             -> 90, 1560
+
+Anything else is 0. Results are whole minutes. parse_time_to_minutes() keeps
+a bounded LRU cache, since a corpus repeats the same few dozen strings;
+parse_times() and normalize_times() are the batch forms for a whole corpus.
+"""
+import re
+import functools
+
+TIME_FIELDS = ('prepTime', 'cookTime', 'totalTime')
+CACHE_SIZE = 4096
+
+_UNIT_MINUTES = {'w': 10080, 'd': 1440, 'h': 60, 'm': 1, 's': 1 / 60}
+_WORD_NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'half': 0.5, 'half a': 0.5, 'half an': 0.5}
+_FRACTIONS = str.maketrans({'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4', '¾': ' 3/4'})
+
+# longest spelling first; the first letter is the key into _UNIT_MINUTES
+_UNIT = r'weeks?|wks?|days?|d|hours?|hrs?|h|minutes?|mins?|m|seconds?|secs?|s'
+# a comma is a decimal point only with one or two digits and a unit after it
+_NUMBER = rf'\d+/\d+|\d+(?:\.\d+|,\d{{1,2}}(?=\s*(?:{_UNIT})(?![a-z])))?(?:\s+\d+/\d+)?'
+_QUANTITY_RE = re.compile(rf'(?:({_NUMBER})\s*({_UNIT})?|\b(half(?:\s+an?)?|an?|one)\s+({_UNIT}))(?![a-z])')
+_RANGE_RE = re.compile(r'\s*(?:-|–|—|\bto\b|\bor\b)\s*')
+_CLOCK_RE = re.compile(r'(\d+):([0-5]\d)')
+_ISO_NUMBER = r'(\d+(?:[.,]\d+)?)'
+_ISO_RE = re.compile(rf'p(?:{_ISO_NUMBER}w)?(?:{_ISO_NUMBER}d)?(?:t(?:{_ISO_NUMBER}h)?(?:{_ISO_NUMBER}m)?(?:{_ISO_NUMBER}s)?)?')
+
+
+def _number(text):
+    """'1.5' -> 1.5, '1,5' -> 1.5, '1/2' -> 0.5, '1 1/2' -> 1.5"""
+    value = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            value += int(numerator) / int(denominator) if int(denominator) else 0
+        else:
+            value += float(part.replace(',', '.'))
+    return value
+
+
+def _quantities(text):
+    """(minutes, unitless numbers, minutes per unit of the first unit) of one side of a range"""
+    minutes = 0.0
+    unitless = []
+    first_unit = last_unit = None
+    for number, unit, word, word_unit in _QUANTITY_RE.findall(text):
+        if word:
+            value, unit = _WORD_NUMBERS[' '.join(word.split())], word_unit
+        else:
+            value = _number(number)
+        if not unit:
+            # "1 hour 30", "1h30": minutes after the hours
+            if last_unit == 60:
+                minutes += value
+            else:
+                unitless.append(value)
+            continue
+        last_unit = _UNIT_MINUTES[unit[0]]
+        first_unit = first_unit or last_unit
+        minutes += value * last_unit
+    return minutes, unitless, first_unit
+
+
+def _parse(text):
+    text = text.lower().translate(_FRACTIONS).strip()
+    if not text:
+        return 0
+    iso = _ISO_RE.fullmatch(text)
+    if iso and text not in ('p', 'pt') and not text.endswith('t'):
+        return round(sum(float(value.replace(',', '.')) * minutes
+                         for value, minutes in zip(iso.groups(), (10080, 1440, 60, 1, 1 / 60)) if value))
+    clock = _CLOCK_RE.fullmatch(text)
+    if clock:
+        return int(clock.group(1)) * 60 + int(clock.group(2))
+    # a range is as long as its longer end; "20-30 minutes" gives the 20 the
+    # unit of the 30, and numbers with no unit anywhere are minutes
+    sides = [_quantities(side) for side in _RANGE_RE.split(text)]
+    longest = 0.0
+    unit = 1
+    for minutes, unitless, first_unit in reversed(sides):
+        unit = first_unit or unit
+        longest = max(longest, minutes + sum(unitless) * unit)
+    return round(longest)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_time_to_minutes(time_str):
+    """Convert a time string like '1 hour 45 minutes' to whole minutes (0 if unreadable)"""
+    return _parse(time_str) if time_str else 0
+
+
+def parse_times(values):
+    """Minutes for each of a sequence of time strings, parsing each distinct string once"""
+    minutes = {value: parse_time_to_minutes(value) for value in set(values)}
+    return [minutes[value] for value in values]
+
+
+def total_minutes(prep, cook, total):
+    """A recipe's total time in minutes: totalTime, else prepTime + cookTime"""
+    return parse_time_to_minutes(total) or parse_time_to_minutes(prep) + parse_time_to_minutes(cook)
+
+
+def normalize_times(recipes):
+    """Minutes of prepTime, cookTime and totalTime for a whole corpus in one call.
+
+    recipes are mappings of those fields to time strings (missing fields
+    count as 0). Returns {field: [minutes of each recipe]}, with totalTime
+    falling back to prepTime + cookTime, for sorting and filtering at build
+    time.
+    """
+    recipes = list(recipes)
+    columns = {field: parse_times([recipe.get(field) or '' for recipe in recipes]) for field in TIME_FIELDS}
+    columns['totalTime'] = [total or prep + cook for prep, cook, total in
+                            zip(columns['prepTime'], columns['cookTime'], columns['totalTime'])]
+    return columns
+
+
+def format_minutes(minutes):
+    """105 -> '1 hour 45 minutes'"""
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f'{hours} hour' + ('s' if hours > 1 else ''))
+    if minutes or not hours:
+        parts.append(f'{minutes} minute' + ('s' if minutes != 1 else ''))
+    return ' '.join(parts)
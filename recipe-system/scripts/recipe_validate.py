@@ -0,0 +1,251 @@
+"""
+Standalone, parallel schema validation of recipe files.
+
+validate_recipes() checks recipe XML against recipe.xsd as a stage of its
+own: files are sent to worker processes in chunks, each worker compiling its
+own copy of the schema, and pass/fail results are cached per content hash in
+web/.validation-cache.sqlite, so a file is validated again only when its
+content or the schema changes. The site build consults the same cache, so a
+`validate` run ahead of it (as in CI) leaves the build nothing to validate.
+The outcome is a ValidationReport whose as_dict() is the machine-readable
+report; with fail_fast the run stops at the first invalid recipe.
+"""
+import os
+import json
+import time
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from lxml import etree
+
+from build_manifest import file_hash
+from recipe_metadata import SCHEMA_PATH, compile_schema, validate_tree
+
+VALIDATION_CACHE_NAME = '.validation-cache.sqlite'
+REPORT_VERSION = 1
+CHUNK_SIZE = 64  # files per worker task
+
+_schema = None
+_schema_path = None
+
+
+def init_worker(schema_path=SCHEMA_PATH):
+    """Compile this process's own copy of the schema"""
+    global _schema, _schema_path
+    _schema = compile_schema(schema_path)
+    _schema_path = schema_path
+
+
+def schema_key(schema_path=SCHEMA_PATH):
+    """Key that invalidates cached results when the schema changes ('' for no usable schema)"""
+    if compile_schema(schema_path) is None:
+        return ''
+    return file_hash(schema_path)
+
+
+def validate_file(path, schema=None):
+    """Parse and validate one recipe file; return (valid, errors)"""
+    try:
+        tree = etree.parse(path)
+    except (OSError, etree.XMLSyntaxError) as e:
+        return False, [f'{type(e).__name__}: {e}']
+    return validate_tree(tree, schema)
+
+
+def validate_chunk(paths):
+    """Worker task: (valid, errors) of each path with this process's schema"""
+    return [validate_file(path, _schema) for path in paths]
+
+
+class ValidationCache:
+    """SQLite cache of validation results keyed by recipe content hash.
+
+    File stamps (mtime, size, hash) are kept per path as well, so an
+    unchanged file is matched to its result from its stat alone.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha256 TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results (sha256 TEXT PRIMARY KEY, valid INTEGER, errors TEXT)')
+        row = self.conn.execute("SELECT value FROM info WHERE key = 'schema'").fetchone()
+        if row is None or row[0] != key:
+            # file stamps only describe content, so they survive a schema change
+            self.conn.execute('DELETE FROM results')
+            self.conn.execute("INSERT OR REPLACE INTO info VALUES ('schema', ?)", (key,))
+        self._files = {r[0]: r[1:] for r in self.conn.execute('SELECT path, mtime_ns, size, sha256 FROM files')}
+        self._valid = dict(self.conn.execute('SELECT sha256, valid FROM results'))
+
+    def content_hash(self, path):
+        """sha256 of path, hashing the file only if its stat changed since it was recorded"""
+        st = os.stat(path)
+        row = self._files.get(path)
+        if row is not None and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            return row[2]
+        sha256 = file_hash(path)
+        self.record(path, st.st_mtime_ns, st.st_size, sha256)
+        return sha256
+
+    def record(self, path, mtime_ns, size, sha256):
+        """Remember the content hash of path at the given stat"""
+        if self._files.get(path) != (mtime_ns, size, sha256):
+            self._files[path] = (mtime_ns, size, sha256)
+            self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (path, mtime_ns, size, sha256))
+
+    def get(self, sha256):
+        """Return the cached (valid, errors) of a content hash, or None"""
+        valid = self._valid.get(sha256)
+        if valid is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if valid:
+            return True, []
+        row = self.conn.execute('SELECT errors FROM results WHERE sha256 = ?', (sha256,)).fetchone()
+        return False, json.loads(row[0])
+
+    def put(self, sha256, valid, errors):
+        self._valid[sha256] = int(valid)
+        self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                          (sha256, int(valid), json.dumps(list(errors))))
+
+    def prune(self, keep_paths):
+        """Forget every file not in keep_paths, and results no remaining file has"""
+        stale = set(self._files) - set(keep_paths)
+        for path in stale:
+            del self._files[path]
+        self.conn.executemany('DELETE FROM files WHERE path = ?', ((p,) for p in stale))
+        live = {row[2] for row in self._files.values()}
+        dead = [sha256 for sha256 in self._valid if sha256 not in live]
+        for sha256 in dead:
+            del self._valid[sha256]
+        self.conn.executemany('DELETE FROM results WHERE sha256 = ?', ((s,) for s in dead))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ValidationReport:
+    """Outcome of one validation run"""
+
+    def __init__(self, total, schema_path=SCHEMA_PATH, fail_fast=False):
+        self.total = total
+        self.schema_path = schema_path
+        self.fail_fast = fail_fast
+        self.valid = 0
+        self.cached = 0
+        self.failures = []  # (path, errors)
+        self.stopped = False
+        self.seconds = 0.0
+
+    def add(self, path, valid, errors, cached=False):
+        self.cached += cached
+        if valid:
+            self.valid += 1
+        else:
+            self.failures.append((path, list(errors)))
+
+    @property
+    def checked(self):
+        return self.valid + len(self.failures)
+
+    @property
+    def ok(self):
+        return not self.failures and not self.stopped
+
+    def as_dict(self):
+        return {
+            'version': REPORT_VERSION,
+            'schema': self.schema_path,
+            'ok': self.ok,
+            'total': self.total,
+            'checked': self.checked,
+            'valid': self.valid,
+            'invalid': len(self.failures),
+            'skipped': self.total - self.checked,
+            'cached': self.cached,
+            'failFast': self.fail_fast,
+            'stopped': self.stopped,
+            'seconds': round(self.seconds, 3),
+            'failures': [{'path': path, 'errors': errors} for path, errors in sorted(self.failures)],
+        }
+
+    def summary(self):
+        text = (f'Validated {self.checked} of {self.total} recipe(s): {self.valid} valid, '
+                f'{len(self.failures)} invalid ({self.cached} from cache) in {self.seconds:.2f} s')
+        if self.stopped:
+            text += f'; stopped at the first failure, {self.total - self.checked} not checked'
+        return text
+
+
+def validate_recipes(paths, cache, jobs=1, fail_fast=False, schema_path=SCHEMA_PATH):
+    """Validate recipe files against the schema; return a ValidationReport.
+
+    Cached results are used for unchanged content; files that cannot be
+    read are reported as invalid; the rest are validated in chunks, across `jobs` worker processes when jobs > 1, and cached. With
+    fail_fast no further chunks are started after the first invalid recipe.
+    """
+    start = time.perf_counter()
+    report = ValidationReport(len(paths), schema_path, fail_fast)
+    pending = []
+    for path in paths:
+        try:
+            sha256 = cache.content_hash(path)
+        except OSError as e:
+            # missing or unreadable: a failure of this file, not of the run
+            result = False, [f'{type(e).__name__}: {e}']
+            report.add(path, *result)
+        else:
+            result = cache.get(sha256)
+            if result is None:
+                pending.append((path, sha256))
+                continue
+            report.add(path, *result, cached=True)
+        if fail_fast and not result[0]:
+            report.stopped = True
+            break
+
+    chunks = [pending[i:i + CHUNK_SIZE] for i in range(0, len(pending), CHUNK_SIZE)]
+
+    def finish(chunk, results):
+        for (path, sha256), (valid, errors) in zip(chunk, results):
+            cache.put(sha256, valid, errors)
+            report.add(path, valid, errors)
+        return fail_fast and any(not valid for valid, _ in results)
+
+    if report.stopped or not chunks:
+        pass
+    elif jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(schema_path,)) as pool:
+            running = {pool.submit(validate_chunk, [path for path, _ in chunk]): chunk for chunk in chunks}
+            while running and not report.stopped:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report.stopped = finish(running.pop(future), future.result()) or report.stopped
+            if report.stopped:
+                pool.shutdown(cancel_futures=True)
+    else:
+        if _schema_path != schema_path:
+            init_worker(schema_path)
+        for chunk in chunks:
+            if finish(chunk, validate_chunk([path for path, _ in chunk])):
+                report.stopped = True
+                break
+    report.stopped = report.stopped and report.checked < report.total
+    cache.commit()
+    report.seconds = time.perf_counter() - start
+    return report
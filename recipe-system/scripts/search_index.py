@@ -0,0 +1,52 @@
+"""
+Inverted full-text index for the recipe box search.
+
+Every recipe's title, summary, tags, ingredients and steps are tokenized at
+extraction time (recipe_terms). At index time each term maps to the sorted
+list of integer recipe ids containing it, stored delta-encoded. Terms are
+split into files by their first character so the page only loads the part of
+the index a query touches, and a lookup costs in proportion to the number of
+matching postings rather than the size of the collection.
+"""
+import re
+import string
+
+SEARCH_PREFIX = 'search-'
+SHARD_KEYS = frozenset(string.ascii_lowercase + string.digits)
+OTHER_KEY = '_'
+STOPWORDS = frozenset(['a', 'an', 'and', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into',
+                       'is', 'it', 'of', 'on', 'or', 'the', 'then', 'to', 'until', 'with'])
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Split text into lowercase letter/digit runs (matches the page's tokenizer)"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def recipe_terms(*texts):
+    """Return the sorted, de-duplicated index terms for a recipe's texts"""
+    # one pass over all the text; each distinct token is filtered once
+    tokens = set(tokenize(' '.join(filter(None, texts))))
+    return sorted(t for t in tokens if len(t) > 1 and t not in STOPWORDS)
+
+
+def shard_key(term):
+    """Index file a term belongs to: its first character, or '_' for others"""
+    return term[0] if term[0] in SHARD_KEYS else OTHER_KEY
+
+
+def delta_encode(ids):
+    """[3, 7, 8] -> [3, 4, 1]"""
+    return [b - a for a, b in zip([0, *ids], ids)]
+
+
+def build_postings(term_lists):
+    """Map each term to the increasing list of recipe ids that contain it"""
+    postings = {}
+    for recipe_id, terms in enumerate(term_lists):
+        for term in terms:
+            postings.setdefault(term, []).append(recipe_id)
+    return postings
+
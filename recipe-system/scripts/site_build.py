@@ -0,0 +1,467 @@
+"""
+Single-pass site build.
+
+Each recipe XML is parsed once; the same tree is validated against the XSD,
+mined for recipe box metadata and transformed into its HTML page. Recipes are
+streamed one at a time (or across a process pool), so only the small metadata
+records are kept for the recipe box, which is written at the end. Validation
+results are shared with the standalone `validate` stage (recipe_validate.py)
+through its content-hash cache. Pages link to fingerprinted CSS/JS assets and
+get precompressed copies (static_assets.py).
+"""
+import os
+import time
+import bisect
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+
+from build_profile import NULL_PROFILER, span
+from build_manifest import MANIFEST_NAME, BuildManifest, file_hash, fingerprint, is_changed, page_stamp
+from metadata_cache import CACHE_NAME, MetadataCache
+import recipe_box
+import recipe_index
+from recipe_box import PROBE_CACHE_NAME, ServerProbe, create_link_html, write_box_page
+from recipe_index import INDEX_DIR_NAME, IndexWriter
+from recipe_metadata import extract_metadata, metadata_cache_key, validate_tree
+from recipe_renderer import DEFAULT_XSL, RecipeRenderer
+from recipe_validate import VALIDATION_CACHE_NAME, ValidationCache, schema_key, validate_recipes
+from static_assets import AssetWriter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RECIPES_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'recipes'))
+WEB_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'web'))
+BOX_ENTRY = 'recipe-box.html'  # key of the box in the manifest's 'box' section
+
+_renderer = None
+
+
+def init_worker(xsl_path):
+    """Compile the stylesheet once for this process"""
+    global _renderer
+    _renderer = RecipeRenderer(xsl_path)
+    _renderer.compile()
+
+
+def build_recipe(xml_path, output_file, render=True, extract=True, spans=None, validation=None, css_href=None):
+    """Parse one recipe and feed the tree to metadata extraction and XSLT.
+
+    Returns the metadata, a Recipe (None if extract is False). A cached
+    (valid, errors) in validation skips the XSD check; with css_href the page
+    links to that stylesheet instead of inlining it. Stage timings are
+    appended to spans when given.
+    """
+    spans = [] if spans is None else spans
+    with span(spans, 'parse'):
+        tree = etree.parse(xml_path)
+    metadata = None
+    if extract:
+        with span(spans, 'validate'):
+            valid, errors = validate_tree(tree) if validation is None else validation
+        with span(spans, 'extract'):
+            metadata = extract_metadata(tree, validate=False)
+        metadata.set_validation(valid, errors)
+    if render:
+        with span(spans, 'transform'):
+            html_content = _renderer.render_tree(tree, css_href)
+        with span(spans, 'write'):
+            # readers of the web directory never see a half-written page
+            tmp_file = output_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            os.replace(tmp_file, output_file)
+    return metadata
+
+
+def build_job(task, css_href=None):
+    """Pool task wrapper around build_recipe; returns (metadata, error, spans)"""
+    _, xml_path, output_file, _, render, extract, validation = task
+    spans = []
+    try:
+        return build_recipe(xml_path, output_file, render, extract, spans, validation, css_href), None, spans
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}', spans
+
+
+def iter_recipe_files(recipes_dir):
+    """Yield recipe XML file names in a stable order"""
+    with os.scandir(recipes_dir) as it:
+        names = [entry.name for entry in it if entry.name.endswith('.xml') and entry.is_file()]
+    yield from sorted(names)
+
+
+class SiteBuilder:
+    """Incremental build state for one web directory.
+
+    Holds the build manifest, the metadata cache, the index writer and the
+    metadata of every recipe. build_site() uses one for a single run; watch
+    mode keeps one alive so the compiled stylesheet, the schema and all
+    recipe metadata stay in memory between rebuilds. With assets (the
+    default) shared CSS/JS are written as fingerprinted files and every
+    page and index file gets .gz/.br copies.
+    """
+
+    def __init__(self, recipes_dir=RECIPES_DIR, web_dir=WEB_DIR, xsl_path=DEFAULT_XSL, profiler=NULL_PROFILER,
+                 assets=True):
+        self.recipes_dir = recipes_dir
+        self.web_dir = web_dir
+        self.xsl_path = xsl_path
+        self.profiler = profiler
+        self.output_dir = os.path.join(web_dir, 'recipes')
+        self.box_path = os.path.join(web_dir, 'recipe-box.html')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.create_link = None  # markup of the "Create Recipe" link; see use_create_link()
+        self.probe = None
+        self.manifest = BuildManifest(os.path.join(web_dir, MANIFEST_NAME))
+        self.assets = AssetWriter(web_dir, self.manifest) if assets else None
+        self.css_href = None
+        self.index = IndexWriter(os.path.join(web_dir, INDEX_DIR_NAME))
+        self.cache = None
+        self.validation = None
+        self.names = []
+        self.recipes_by_name = {}
+        self.unloaded = {}  # filename -> xml path of recipes whose cached metadata is not read yet
+        self.restamped = False
+        self.unsaved = False
+        self.reload()
+
+    def use_create_link(self, mode):
+        """Choose how the recipe box gets its "Create Recipe" link (recipe_box.CREATE_LINK_MODES).
+
+        A 'probe' runs in the background from now until the box is first
+        written, with its answer cached in the web directory.
+        """
+        if mode == 'probe':
+            self.probe = ServerProbe(cache_path=os.path.join(self.web_dir, PROBE_CACHE_NAME))
+        else:
+            self.create_link = create_link_html(mode)
+
+    def reload(self):
+        """Re-key pages and cached metadata on the current stylesheet and schema"""
+        self.css_href = None
+        if self.assets is not None:
+            try:
+                css = RecipeRenderer(self.xsl_path).stylesheet_css()
+            except (OSError, etree.XMLSyntaxError):
+                css = None  # the build reports the stylesheet error
+            if css is not None:
+                self.css_href = '../' + self.assets.asset('recipe', css, '.css')
+        self.pages = self.manifest.section('pages', {'xsl': file_hash(self.xsl_path), 'css': self.css_href})
+        if self.cache is not None:
+            self.cache.close()
+            self.validation.close()
+        self.cache = MetadataCache(os.path.join(self.web_dir, CACHE_NAME), metadata_cache_key())
+        self.validation = ValidationCache(os.path.join(self.web_dir, VALIDATION_CACHE_NAME), schema_key())
+        self.recipes_by_name = {}
+        self.unloaded = {}
+
+    def _task(self, filename):
+        """Return the build task for a recipe, or None if page and metadata are current"""
+        xml_path = os.path.join(self.recipes_dir, filename)
+        output_file = os.path.join(self.output_dir, os.path.splitext(filename)[0] + '.html')
+        previous = self.pages.get(filename)
+        with self.profiler.stage('fingerprint', filename):
+            entry = fingerprint(xml_path, previous)
+            # a page rewritten by another tool (recipe-gen.py) no longer matches its stamp
+            render = is_changed(previous, entry) or entry.get('page') != page_stamp(output_file)
+            extract = not self.cache.check(xml_path, entry['mtime_ns'], entry['size'], entry['sha256'])
+        # refresh the stat stamp of up-to-date pages so the next run skips hashing
+        if not render:
+            self.restamped = self.restamped or entry is not previous
+            self.pages[filename] = entry
+        if extract:
+            self.unloaded.pop(filename, None)
+        elif filename not in self.recipes_by_name:
+            # read later in one query, and only if the index is rewritten
+            self.unloaded[filename] = xml_path
+        if render or extract:
+            validation = self.validation.get(entry['sha256']) if extract else None
+            return (filename, xml_path, output_file, entry, render, extract, validation)
+        return None
+
+    def _remember(self, filename, metadata):
+        metadata.id = os.path.splitext(filename)[0]
+        self.recipes_by_name[filename] = metadata
+
+    def _load(self):
+        """Read the cached metadata of every recipe not loaded yet"""
+        if not self.unloaded:
+            return
+        with self.profiler.stage('metadata_load'):
+            loaded = self.cache.load(self.unloaded.values())
+        for filename, xml_path in self.unloaded.items():
+            if xml_path in loaded:
+                self._remember(filename, loaded[xml_path])
+        self.unloaded = {}
+
+    def build(self, filenames, jobs=1):
+        """Render stale pages and extract stale metadata of the given recipe files.
+
+        Returns (built, errors) with errors a list of (xml_file, error).
+        """
+        profiler = self.profiler
+        pending = (task for task in map(self._task, filenames) if task is not None)
+        pool = None
+        if jobs > 1:
+            tasks = list(pending)
+            pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(self.xsl_path,))
+            job = functools.partial(build_job, css_href=self.css_href)
+            results = zip(tasks, pool.map(job, tasks, chunksize=max(1, len(tasks) // (jobs * 8))))
+        else:
+            # stream: each recipe is parsed, extracted, rendered and released in turn
+            if _renderer is None or _renderer.xsl_path != self.xsl_path:
+                with profiler.stage('compile'):
+                    init_worker(self.xsl_path)
+            results = ((task, build_job(task, self.css_href)) for task in pending)
+
+        built = 0
+        errors = []
+        try:
+            for task, (metadata, error, spans) in results:
+                filename, xml_path, output_file, entry, render, extract, validation = task
+                profiler.merge(spans, filename)
+                profiler.count('files_parsed')
+                if error:
+                    errors.append((filename, error))
+                    self.pages.pop(filename, None)
+                    self.recipes_by_name.pop(filename, None)
+                    self.unloaded.pop(filename, None)
+                    continue
+                built += 1
+                if render:
+                    self.pages[filename] = dict(entry, page=page_stamp(output_file))
+                    print(f'Generated: {output_file}')
+                    if profiler.enabled:
+                        profiler.count('bytes_written', os.path.getsize(output_file))
+                    if self.assets is not None:
+                        with profiler.stage('compress', filename):
+                            self.assets.compress([output_file])
+                if extract:
+                    self.cache.store(xml_path, entry['mtime_ns'], entry['size'], entry['sha256'], metadata)
+                    self._remember(filename, metadata)
+                    self.validation.record(xml_path, entry['mtime_ns'], entry['size'], entry['sha256'])
+                    if validation is None:
+                        self.validation.put(entry['sha256'], metadata.valid, metadata.validationErrors)
+                    if not metadata.valid:
+                        profiler.count('validation_failures')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        profiler.count('render_errors', len(errors))
+        return built, errors
+
+    def _forget(self, filename):
+        """Drop the page and metadata of a recipe file that no longer exists"""
+        output_file = os.path.join(self.output_dir, os.path.splitext(filename)[0] + '.html')
+        if os.path.exists(output_file):
+            os.remove(output_file)
+            print(f'Removed: {output_file}')
+        if self.assets is not None:
+            self.assets.forget(output_file)
+        self.pages.pop(filename, None)
+        self.recipes_by_name.pop(filename, None)
+        self.unloaded.pop(filename, None)
+        self.cache.discard(os.path.join(self.recipes_dir, filename))
+
+    def prune(self):
+        """Drop pages and metadata of recipes that no longer exist; return how many"""
+        present = set(self.names)
+        stale = sorted((set(self.pages) | set(self.recipes_by_name)) - present)
+        for filename in stale:
+            self._forget(filename)
+        return len(stale)
+
+    def save(self, prune=True):
+        with self.profiler.stage('manifest_save'):
+            self.manifest.save()
+            if prune:
+                paths = [os.path.join(self.recipes_dir, filename) for filename in self.names]
+                self.cache.prune(paths)
+                self.validation.prune(paths)
+            self.cache.commit()
+            self.validation.commit()
+        self.unsaved = False
+
+    def recipes(self):
+        """Metadata of every successfully built recipe, in file name order"""
+        self._load()
+        by_name = self.recipes_by_name
+        return [by_name[filename] for filename in self.names if filename in by_name]
+
+    def _apply(self, changed):
+        """Update or append the index entries of the changed recipe files.
+
+        Returns False, leaving the index untouched, if one of them dropped
+        out of the index (deleted or failed), which needs a full write().
+        """
+        self._load()
+        index = self.index
+        by_name = self.recipes_by_name
+        for filename in changed:
+            if filename not in by_name and os.path.splitext(filename)[0] in index.positions:
+                return False
+        index.apply([by_name[filename] for filename in changed if filename in by_name])
+        return True
+
+    def write_box(self, changed=None):
+        """Write the index and recipe-box.html; return the indexed recipes.
+
+        With `changed`, only the index files those recipes touch are
+        rewritten: edited recipes are updated in place and new ones are
+        appended. Deletions and full rebuilds rewrite the whole index.
+        """
+        index = self.index
+        with self.profiler.stage('index'):
+            if changed is not None and index.recipes is not None and self._apply(changed):
+                recipes = index.recipes
+                index_manifest = index.manifest()
+            else:
+                recipes = self.recipes()
+                index_manifest = index.write(recipes)
+        if self.probe is not None:
+            with self.profiler.stage('server_probe'):
+                self.create_link = self.probe.link_html()
+            self.probe = None
+        write_box_page(index_manifest, self.box_path, self.create_link, self.profiler, self.assets)
+        index_files = index.take_changes()
+        if self.assets is not None:
+            with self.profiler.stage('compress'):
+                if changed is None:
+                    # unchanged files cost a stat; this catches copies missing or left behind
+                    self.assets.compress_dir(index.index_dir)
+                    self.assets.compress_dir(self.output_dir)
+                    self.assets.prune()
+                else:
+                    for path in index_files:
+                        if os.path.exists(path):
+                            self.assets.compress([path])
+                        else:
+                            self.assets.forget(path)
+        self._box()[BOX_ENTRY] = dict(fingerprint(self.box_path), recipes=len(recipes))
+        self.unsaved = True
+        return recipes
+
+    def _box(self):
+        """Manifest entries recording what the last written recipe box was built with"""
+        return self.manifest.section('box', {
+            'code': {module.__name__: file_hash(module.__file__) for module in (recipe_box, recipe_index)},
+            'create_link': self.create_link,
+            'assets': self.assets is not None,
+        })
+
+    def _box_current(self):
+        """Return the box entry if the index and recipe-box.html on disk are the last ones written, else None"""
+        if self.probe is not None or not os.path.isdir(self.index.index_dir) or not os.path.exists(self.box_path):
+            return None
+        previous = self._box().get(BOX_ENTRY)
+        if previous is None or is_changed(previous, fingerprint(self.box_path, previous)):
+            return None
+        return previous
+
+    def rebuild(self, filenames=None, jobs=1):
+        """Bring pages, metadata and the recipe box up to date.
+
+        With filenames, only those recipe files are checked (watch mode, the
+        web form) and the work done does not grow with the collection: the
+        recipes directory is not rescanned and the build manifest is saved
+        on close(). Otherwise every recipe is, and when no recipe changed the
+        index and the box are left as they are, so a no-op build costs a
+        stat per recipe. Returns (built, number of recipes in the box, errors).
+        """
+        self.restamped = False
+        if self.index.recipes is None:
+            filenames = None  # nothing is known about the other recipes yet
+        if filenames is None:
+            self.names = list(iter_recipe_files(self.recipes_dir))
+            targets = self.names
+        else:
+            targets = []
+            for filename in filenames:
+                n = bisect.bisect_left(self.names, filename)
+                listed = n < len(self.names) and self.names[n] == filename
+                if os.path.isfile(os.path.join(self.recipes_dir, filename)):
+                    targets.append(filename)
+                    if not listed:
+                        self.names.insert(n, filename)
+                elif listed:
+                    del self.names[n]
+                    self._forget(filename)
+        built, errors = self.build(targets, jobs)
+        if filenames is not None:
+            self.cache.commit()
+            self.validation.commit()
+            self.unsaved = True
+            return built, len(self.write_box(changed=filenames)), errors
+        forgotten = self.prune()
+        box = self._box_current()
+        if box is not None and not (built or errors or forgotten or self.restamped):
+            return built, box['recipes'], errors
+        # the manifest is saved after the box so it only records a box that was written
+        count = len(self.write_box())
+        self.save()
+        return built, count, errors
+
+    def close(self):
+        if self.unsaved:
+            self.save(prune=False)
+        self.cache.close()
+        self.validation.close()
+
+
+def validate_site(recipes_dir=RECIPES_DIR, web_dir=WEB_DIR, jobs=1, fail_fast=False, paths=None):
+    """Validate the given recipe files (default: all in recipes_dir) with the cache in web_dir.
+
+    Returns the ValidationReport.
+    """
+    if paths is None:
+        paths = [os.path.join(recipes_dir, filename) for filename in iter_recipe_files(recipes_dir)]
+        prune = True
+    else:
+        prune = False
+    with ValidationCache(os.path.join(web_dir, VALIDATION_CACHE_NAME), schema_key()) as cache:
+        report = validate_recipes(paths, cache, jobs, fail_fast)
+        if prune:
+            cache.prune(paths)
+    return report
+
+
+def build_site(recipes_dir=RECIPES_DIR, web_dir=WEB_DIR, xsl_path=DEFAULT_XSL, jobs=1, profiler=NULL_PROFILER,
+               create_link='client', fail_fast=False, assets=True):
+    """Build every stale recipe page plus recipe-box.html in one pass.
+
+    With fail_fast, every recipe is validated first (see validate_site())
+    and nothing is built if one is invalid. assets=False inlines CSS/JS in
+    every page and writes no compressed copies. Returns a list of
+    (xml_file, error) for recipes that failed.
+    """
+    start = time.perf_counter()
+    if fail_fast:
+        with profiler.stage('validate_all'):
+            report = validate_site(recipes_dir, web_dir, jobs, fail_fast=True)
+        print(report.summary())
+        if not report.ok:
+            errors = [(os.path.basename(path), errors[0] if errors else 'invalid')
+                      for path, errors in report.failures]
+            print(f'Not building: {len(errors)} recipe(s) failed validation:')
+            for filename, error in errors:
+                print(f'  {filename}: {error}')
+            return errors
+    builder = SiteBuilder(recipes_dir, web_dir, xsl_path, profiler, assets)
+    builder.use_create_link(create_link)
+    try:
+        built, count, errors = builder.rebuild(jobs=jobs)
+    finally:
+        builder.close()
+    elapsed = time.perf_counter() - start
+    names = builder.names
+    profiler.count('files_scanned', len(names))
+    profiler.count('cache_hits', builder.cache.hits)
+    profiler.count('cache_misses', builder.cache.misses)
+
+    print(f'Built {built} recipe(s), {len(names) - built - len(errors)} unchanged, in {elapsed:.2f} s using {jobs} job(s)')
+    print(f'Generated recipe-box.html with {count} recipes at {builder.box_path}')
+    if errors:
+        print(f'{len(errors)} recipe(s) failed:')
+        for filename, error in errors:
+            print(f'  {filename}: {error}')
+    return errors
@@ -0,0 +1,201 @@
+"""
+Watch mode: rebuild recipe pages and the recipe box as files change.
+
+recipes/, stylesheets/ and schemas/ are watched with inotify (Linux, through
+libc via ctypes) or, where that is unavailable, by polling directory stats.
+Events are debounced so an editor's write/rename burst causes one rebuild.
+A single SiteBuilder stays alive between rebuilds, keeping the compiled
+stylesheet and schema and every recipe's metadata and index postings in
+memory, so saving a recipe re-renders just that page and rewrites just the
+index files it touches. A stylesheet change re-renders every page; a schema
+change re-validates every recipe.
+"""
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+
+from build_profile import NULL_PROFILER
+from recipe_metadata import SCHEMA_PATH, load_schema
+from site_build import RECIPES_DIR, WEB_DIR, DEFAULT_XSL, SiteBuilder, init_worker
+
+DEBOUNCE_SECONDS = 0.02
+POLL_SECONDS = 0.25
+WATCHED_SUFFIXES = ('.xml', '.xsl', '.xsd')
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Directory change events from Linux inotify"""
+
+    name = 'inotify'
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        # IN_CREATE catches recipes hard-linked into place (recipe_import.publish)
+        mask = IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'cannot watch {directory}')
+            self.directories[wd] = directory
+
+    def read(self, timeout=None):
+        """Wait up to timeout seconds (None: forever) for events.
+
+        Returns the set of changed paths, or None if events were lost and
+        everything must be rescanned.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if name and wd in self.directories:
+                paths.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Directory change detection by comparing stat snapshots"""
+
+    name = 'polling'
+
+    def __init__(self, directories, interval=POLL_SECONDS):
+        self.directories = list(directories)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for directory in self.directories:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.endswith(WATCHED_SUFFIXES):
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def read(self, timeout=None):
+        """Poll until something changed or timeout seconds passed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            time.sleep(max(0.0, min(self.interval, remaining)))
+            snapshot = self._scan()
+            old, self.snapshot = self.snapshot, snapshot
+            changed = {path for path in old.keys() | snapshot.keys() if old.get(path) != snapshot.get(path)}
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(directories, poll=False):
+    """inotify where available, polling otherwise (or when poll is set)"""
+    if not poll:
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directories)
+
+
+def next_batch(watcher, debounce=DEBOUNCE_SECONDS):
+    """Block for a change, then gather events until none arrive for `debounce` seconds.
+
+    Returns the relevant changed paths, or None to rescan everything.
+    """
+    changed = watcher.read()
+    while changed is not None:
+        more = watcher.read(debounce)
+        if more is None:
+            return None
+        if not more:
+            break
+        changed |= more
+    if changed is None:
+        return None
+    return {path for path in changed
+            if path.endswith(WATCHED_SUFFIXES) and not os.path.basename(path).startswith('.')}
+
+
+def watch(recipes_dir=RECIPES_DIR, web_dir=WEB_DIR, xsl_path=DEFAULT_XSL, poll=False, profiler=NULL_PROFILER,
+          create_link='client', assets=True):
+    """Build once, then rebuild whatever changes until interrupted"""
+    xsl_path = os.path.abspath(xsl_path)
+    builder = SiteBuilder(recipes_dir, web_dir, xsl_path, profiler, assets)
+    # a probe of the generator server runs once, not on every rebuild
+    builder.use_create_link(create_link)
+    built, count, errors = builder.rebuild()
+    print(f'Built {built} recipe(s); recipe box has {count} recipes')
+
+    directories = {os.path.abspath(recipes_dir), os.path.dirname(xsl_path), os.path.dirname(SCHEMA_PATH)}
+    watcher = open_watcher(sorted(directories), poll)
+    print(f'Watching {", ".join(sorted(directories))} ({watcher.name}); press Ctrl+C to stop')
+    try:
+        while True:
+            changed = next_batch(watcher)
+            if changed is not None and not changed:
+                continue
+            start = time.perf_counter()
+            if changed is None or SCHEMA_PATH in changed:
+                load_schema()
+                builder.reload()
+                filenames = None
+            elif xsl_path in changed:
+                # keep serving the current pages while the stylesheet doesn't compile
+                try:
+                    init_worker(xsl_path)
+                except Exception as e:
+                    print(f'Stylesheet error, pages not rebuilt: {e}')
+                    continue
+                builder.reload()
+                filenames = None
+            else:
+                filenames = sorted(os.path.basename(path) for path in changed
+                                   if os.path.dirname(path) == os.path.abspath(recipes_dir) and path.endswith('.xml'))
+                if not filenames:
+                    continue
+            built, count, errors = builder.rebuild(filenames)
+            for filename, error in errors:
+                print(f'  {filename}: {error}')
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f'Rebuilt {built} recipe(s) in {elapsed:.0f} ms; recipe box has {count} recipes')
+    except KeyboardInterrupt:
+        print()
+    finally:
+        watcher.close()
+        builder.close()
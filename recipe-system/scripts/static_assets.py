@@ -0,0 +1,132 @@
+"""
+Fingerprinted assets and precompressed copies of the static site.
+
+CSS and JS shared by many pages are written once to web/assets/ under a name
+carrying a hash of their content (recipe.3f2a9c1b7d.css), and pages link to
+them; a changed asset gets a new name, so servers and CDNs can cache assets
+forever. Pages, assets and index files also get .gz and .br siblings (.br
+when the brotli module is installed) for servers that serve precompressed
+files with a matching Content-Encoding. A file is recompressed only when its
+content hash changes; hashes are kept in the build manifest's 'compressed'
+section and reused while a file's stat is unchanged. recipe-gen.py and
+cookbook-pkg.py keep the copies of the files they write current as well.
+"""
+import os
+import gzip
+import hashlib
+
+from build_manifest import fingerprint, is_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS_DIR_NAME = 'assets'
+HASH_LENGTH = 10
+GZIP_LEVEL = 9
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+
+def _write(path, content):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _asset_key(name):
+    """'recipe.3f2a9c1b7d.css' -> ('recipe', '.css')"""
+    return name.split('.', 1)[0], os.path.splitext(name)[1]
+
+
+def compressed_copies(content):
+    """{suffix: compressed bytes} for every available encoding"""
+    # mtime=0 keeps the .gz identical for identical content
+    copies = {'.gz': gzip.compress(content, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(content, quality=11)
+    return copies
+
+
+class AssetWriter:
+    """Writes fingerprinted assets and keeps precompressed siblings current for one web directory"""
+
+    def __init__(self, web_dir, manifest):
+        self.web_dir = web_dir
+        self.assets_dir = os.path.join(web_dir, ASSETS_DIR_NAME)
+        self.manifest = manifest
+        self.assets = {}  # (stem, ext) -> current file name of each asset written
+        self.compressed = 0
+        self.reload()
+
+    def reload(self):
+        """Re-key recorded hashes on the available encodings"""
+        self.files = self.manifest.section('compressed', {'gzip': GZIP_LEVEL, 'brotli': brotli is not None})
+
+    def asset(self, stem, text, ext):
+        """Write text as assets/<stem>.<hash><ext> (once) and return that path relative to the web directory"""
+        content = text.encode('utf-8')
+        name = f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}'
+        path = os.path.join(self.assets_dir, name)
+        if not os.path.exists(path):
+            os.makedirs(self.assets_dir, exist_ok=True)
+            _write(path, content)
+        self.assets[stem, ext] = name
+        self.compress([path])
+        return f'{ASSETS_DIR_NAME}/{name}'
+
+    def compress(self, paths):
+        """Write .gz/.br siblings of each file whose content changed since it was last compressed"""
+        for path in paths:
+            key = os.path.relpath(path, self.web_dir)
+            previous = self.files.get(key)
+            entry = fingerprint(path, previous)
+            if not is_changed(previous, entry) and all(os.path.exists(path + s) for s in self._suffixes()):
+                self.files[key] = entry
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            copies = compressed_copies(content)
+            for suffix in COMPRESSED_SUFFIXES:
+                if suffix in copies:
+                    _write(path + suffix, copies[suffix])
+                elif os.path.exists(path + suffix):
+                    os.remove(path + suffix)  # left by a run that had brotli
+            self.files[key] = entry
+            self.compressed += 1
+
+    def compress_dir(self, directory):
+        """compress() every file in a directory and drop siblings whose file is gone"""
+        with os.scandir(directory) as it:
+            names = {entry.name for entry in it if entry.is_file()}
+        for name in names:
+            base, suffix = os.path.splitext(name)
+            if suffix in COMPRESSED_SUFFIXES and base not in names:
+                os.remove(os.path.join(directory, name))
+                self.files.pop(os.path.relpath(os.path.join(directory, base), self.web_dir), None)
+        self.compress(os.path.join(directory, name) for name in sorted(names)
+                      if not name.endswith(COMPRESSED_SUFFIXES) and not name.endswith('.tmp'))
+
+    def forget(self, path):
+        """Remove the compressed siblings of a deleted file"""
+        self.files.pop(os.path.relpath(path, self.web_dir), None)
+        for suffix in COMPRESSED_SUFFIXES:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def prune(self):
+        """Delete superseded versions of the assets this writer has written"""
+        if not os.path.isdir(self.assets_dir):
+            return
+        with os.scandir(self.assets_dir) as it:
+            stale = [entry.path for entry in it
+                     if entry.is_file() and not entry.name.endswith(COMPRESSED_SUFFIXES)
+                     and self.assets.get(_asset_key(entry.name), entry.name) != entry.name]
+        for path in stale:
+            os.remove(path)
+            self.forget(path)
+
+    @staticmethod
+    def _suffixes():
+        return COMPRESSED_SUFFIXES if brotli is not None else ('.gz',)
@@ -0,0 +1,111 @@
+"""
+Synthetic, schema-valid recipe corpora for benchmarking.
+
+Titles, summaries, tags, ingredients, steps and times are sampled from the
+hand-written recipes in recipes/, so generated files have realistic sizes and
+shapes (3-7 tags, 5-16 ingredients, 4-12 steps). Generation is seeded and
+deterministic: the same count and seed always produce the same corpus.
+"""
+import os
+import random
+from lxml import etree
+
+from recipe_time import format_minutes
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'recipes'))
+NS = 'http://www.example.com/recipe'
+CATEGORIES = ['uncategorized', 'breakfast', 'main-course', 'soup', 'dessert', 'side-dish',
+              'salad', 'appetizer', 'beverage', 'snack', 'brunch']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+MARKER = '.synthetic-corpus'
+
+
+def load_pools(sample_dir=SAMPLE_DIR):
+    """Collect the text pools synthetic recipes are sampled from"""
+    pools = {'title_words': set(), 'summaries': [], 'tags': set(), 'ingredients': [],
+             'steps': [], 'prepTime': set(), 'cookTime': set()}
+    for filename in sorted(os.listdir(sample_dir)):
+        if not filename.endswith('.xml'):
+            continue
+        root = etree.parse(os.path.join(sample_dir, filename)).getroot()
+        for el in root.iter():
+            if not isinstance(el.tag, str) or not el.text or not el.text.strip():
+                continue
+            name = etree.QName(el).localname
+            text = el.text.strip()
+            if name == 'title':
+                pools['title_words'].update(w for w in text.split() if len(w) > 2)
+            elif name == 'summary':
+                pools['summaries'].append(text)
+            elif name == 'tag':
+                pools['tags'].add(text)
+            elif name == 'ingredient':
+                pools['ingredients'].append((el.get('quantity'), el.get('unit'), text))
+            elif name == 'step':
+                pools['steps'].append(text)
+            elif name in ('prepTime', 'cookTime'):
+                pools[name].add(text)
+    return {key: sorted(value) if isinstance(value, set) else value for key, value in pools.items()}
+
+
+def synthetic_recipe(rng, pools, n):
+    """Build one schema-valid recipe element"""
+    def sub(parent, tag, text=None, **attrs):
+        el = etree.SubElement(parent, f'{{{NS}}}{tag}', {k: v for k, v in attrs.items() if v})
+        el.text = text
+        return el
+
+    root = etree.Element(f'{{{NS}}}recipe', nsmap={None: NS})
+    sub(root, 'title', ' '.join(rng.sample(pools['title_words'], rng.randint(2, 4))).title() + f' {n}')
+    description = sub(root, 'description')
+    sub(description, 'summary', ' '.join(rng.sample(pools['summaries'], rng.randint(1, 2))))
+    tags = sub(description, 'tags')
+    for tag in rng.sample(pools['tags'], min(len(pools['tags']), rng.randint(3, 7))):
+        sub(tags, 'tag', tag)
+
+    prep = rng.choice([5, 10, 15, 15, 20, 30])
+    cook = rng.choice([10, 15, 20, 30, 30, 45, 60, 90, 240])
+    metadata = sub(root, 'metadata')
+    sub(metadata, 'servings', str(rng.choice([2, 4, 4, 4, 6, 8, 12])))
+    sub(metadata, 'prepTime', format_minutes(prep))
+    sub(metadata, 'cookTime', format_minutes(cook))
+    sub(metadata, 'totalTime', format_minutes(prep + cook))
+    sub(metadata, 'difficulty', rng.choice(DIFFICULTIES))
+    sub(root, 'category', rng.choice(CATEGORIES))
+
+    ingredients = sub(root, 'ingredients')
+    for quantity, unit, text in rng.sample(pools['ingredients'], rng.randint(5, 16)):
+        sub(ingredients, 'ingredient', text, quantity=quantity, unit=unit)
+    preparation = sub(root, 'preparation')
+    for number, step in enumerate(rng.sample(pools['steps'], rng.randint(4, 12)), start=1):
+        sub(preparation, 'step', step, number=str(number))
+    sub(root, 'created', '2025-01-01T00:00:00Z')
+    return root
+
+
+def generate_corpus(out_dir, count, seed=0, sample_dir=SAMPLE_DIR):
+    """Write count synthetic recipes to out_dir (reused if already generated)"""
+    stamp = f'{count}:{seed}'
+    marker = os.path.join(out_dir, MARKER)
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if f.read() == stamp:
+                return out_dir
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(out_dir, exist_ok=True)
+    for filename in os.listdir(out_dir):
+        if filename.endswith('.xml'):
+            os.remove(os.path.join(out_dir, filename))
+
+    rng = random.Random(seed)
+    pools = load_pools(sample_dir)
+    for n in range(count):
+        tree = etree.ElementTree(synthetic_recipe(rng, pools, n))
+        tree.write(os.path.join(out_dir, f'synthetic-{n:06d}.xml'),
+                   xml_declaration=True, encoding='UTF-8', pretty_print=True)
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(stamp)
+    return out_dir
@@ -0,0 +1,21 @@
+"""Tests for ingredient normalization (ingredient_index.normalize_ingredient)"""
+import pytest
+
+from ingredient_index import normalize_ingredient, recipe_ingredients
+
+
+@pytest.mark.parametrize('text, names', [
+    ('1 large onion, diced', ['onion']),
+    ('Salt and pepper to taste', ['salt', 'pepper']),
+    ('2 cans (15 oz) kidney beans, drained and rinsed', ['kidney bean']),
+    ('1 (15 oz) can black beans', ['black bean']),
+    ('3 cloves garlic (minced); divided', ['garlic']),
+    ('(optional)', []),
+])
+def test_normalize_ingredient(text, names):
+    assert normalize_ingredient(text) == names
+
+
+def test_recipe_ingredients_keeps_parenthesized_lines():
+    lines = ['1 (15 oz) can black beans', '2 cans (15 oz) kidney beans, drained and rinsed', '1 onion']
+    assert recipe_ingredients(lines) == ['black bean', 'kidney bean', 'onion']
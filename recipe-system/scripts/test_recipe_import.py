@@ -0,0 +1,69 @@
+"""Tests for the web form's recipe writes (recipe_import.prettify_xml, write_new_recipe)"""
+import os
+import threading
+from xml.dom import minidom
+from xml.etree import ElementTree as ET
+
+import pytest
+from lxml import etree
+
+from recipe_import import NS, build_recipe_tree, prettify_xml, recipe_data, write_new_recipe
+
+
+def minidom_xml(tree):
+    """The ElementTree -> minidom round trip the form used to write recipes with"""
+    def plain(elem):
+        copy = ET.Element(etree.QName(elem).localname, dict(elem.items()))
+        copy.text, copy.tail = elem.text, elem.tail
+        copy.extend(plain(child) for child in elem)
+        return copy
+
+    root = plain(tree.getroot())
+    root.attrib = {'xmlns': NS, **root.attrib}
+    return minidom.parseString(ET.tostring(root, encoding='utf-8')).toprettyxml(indent='  ', encoding='utf-8')
+
+
+@pytest.mark.parametrize('record', [
+    {'title': 'Sample Lemon Pasta', 'summary': 'Bright lemon pasta.', 'servings': '2', 'totalTime': '20 minutes',
+     'tags': 'pasta, quick', 'ingredients': '200g spaghetti\n1 lemon, zested', 'steps': 'Cook.\nToss.'},
+    {'title': 'Fish & "Chips" <deluxe>', 'summary': 'Crème brûlée\r\nthen tea\rlater', 'ingredients': 'a > b'},
+    {'title': 'No Lists'},
+])
+def test_prettify_xml_matches_minidom(record):
+    tree = build_recipe_tree(recipe_data(record), '2026-01-01T00:00:00Z')
+    assert prettify_xml(tree) == minidom_xml(tree)
+
+
+def test_prettify_xml_self_closes_empty_elements():
+    root = etree.Element(f'{{{NS}}}recipe', nsmap={None: NS})
+    etree.SubElement(root, f'{{{NS}}}tags')
+    tree = etree.ElementTree(root)
+    assert prettify_xml(tree) == minidom_xml(tree)
+    assert prettify_xml(tree).startswith(b'<?xml version="1.0" encoding="utf-8"?>\n')
+
+
+def _no_hard_links(src, dst):
+    raise PermissionError(1, 'Operation not permitted', dst)
+
+
+@pytest.mark.parametrize('hard_links', [True, False])
+def test_write_new_recipe_same_title_gets_distinct_names(tmp_path, monkeypatch, hard_links):
+    if not hard_links:
+        monkeypatch.setattr(os, 'link', _no_hard_links)
+    start = threading.Barrier(2)
+    written = []
+
+    def write(body):
+        start.wait()
+        written.append(write_new_recipe(str(tmp_path), 'same-title', body))
+
+    threads = [threading.Thread(target=write, args=(body,)) for body in (b'<first/>', b'<second/>')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(written) == ['same-title-2.xml', 'same-title.xml']
+    assert sorted(os.listdir(tmp_path)) == ['same-title-2.xml', 'same-title.xml']  # no temp files left
+    bodies = {(tmp_path / name).read_bytes() for name in written}
+    assert bodies == {b'<first/>', b'<second/>'}
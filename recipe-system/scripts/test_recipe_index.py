@@ -0,0 +1,34 @@
+"""Tests for incremental index writes on a fresh IndexWriter"""
+import pytest
+
+from recipe_index import IndexWriter, MemoryIndex, read_ingredients
+from recipe_model import Recipe
+
+
+def recipe(recipe_id, ingredients, valid=True):
+    return Recipe(title=recipe_id.title(), description='', servings=2, totalTime=10, totalTimeDisplay='10 minutes',
+                  difficulty='easy', tags=('quick',), category='main-course', valid=valid,
+                  terms=(recipe_id,), ingredients=ingredients, id=recipe_id)
+
+
+def test_append_and_update_without_a_prior_write(tmp_path):
+    index = IndexWriter(str(tmp_path))
+    with pytest.raises(KeyError):
+        index.update(recipe('soup', ('onion',)))
+    index.append(recipe('soup', ('onion',)))
+    index.append(recipe('stew', ('beef', 'onion'), valid=False))
+    manifest = index.update(recipe('soup', ('leek',)))
+
+    assert manifest['count'] == 2
+    assert index.positions == {'soup': 0, 'stew': 1}
+    assert index.invalid == {'stew'}
+    payload = read_ingredients(str(tmp_path), index.shard_size)
+    assert payload['names'] == ['beef', 'leek', 'onion']
+    assert payload['totals'] == [1, 2]
+
+
+def test_memory_index_append_without_a_prior_write():
+    index = MemoryIndex()
+    manifest = index.append(recipe('soup', ('onion',)))
+    assert manifest['count'] == 1
+    assert manifest['shards'][0]['file'] in index.files
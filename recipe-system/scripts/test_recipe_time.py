@@ -0,0 +1,23 @@
+"""Tests for recipe duration parsing (recipe_time.parse_time_to_minutes)"""
+import pytest
+
+from recipe_time import format_minutes, parse_time_to_minutes
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('45 minutes', 45), ('45 min', 45), ('45m', 45), ('45', 45),
+    ('1 hr 30 min', 90), ('1h30', 90), ('1:30', 90), ('1.5 hours', 90),
+    ('1,5 hours', 90), ('1,5h', 90), ('2,25 hours', 135), ('1 hour, 30 minutes', 90),
+    ('1 1/2 hours', 90), ('an hour', 60), ('half an hour', 30),
+    ('20-30 minutes', 30), ('1 to 2 hours', 120),
+    ('PT1H30M', 90), ('P1DT2H', 1560),
+    ('', 0), ('to taste', 0),
+])
+def test_parse_time_to_minutes(text, minutes):
+    assert parse_time_to_minutes(text) == minutes
+
+
+def test_format_minutes():
+    assert format_minutes(105) == '1 hour 45 minutes'
+    assert format_minutes(120) == '2 hours'
+    assert format_minutes(1) == '1 minute'
@@ -4,10 +4,18 @@
 
 <xsl:output method="html" encoding="UTF-8" indent="yes"/>
 
+<!-- URL of this stylesheet's CSS written as a file; empty inlines the <style> below -->
+<xsl:param name="css-href" select="''"/>
+
 <xsl:template match="/">
 <html>
 <head>
 <title><xsl:value-of select="r:recipe/r:title"/></title>
+<xsl:choose>
+<xsl:when test="$css-href">
+<link rel="stylesheet" href="{$css-href}"/>
+</xsl:when>
+<xsl:otherwise>
 <style><![CDATA[
 body {
 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -189,6 +197,8 @@ h2 {
   }
 }
 ]]></style>
+</xsl:otherwise>
+</xsl:choose>
 </head>
 <body>
   <div class="recipe-container">